@@ -0,0 +1,113 @@
+"""
+Timing comparison between blocking (llm.invoke) and async (ainvoke) LLM nodes.
+
+Builds a graph with the same shape as the section fan-out in the main workflow
+(one Send() per section) and runs it twice: once with sync nodes calling a fake
+model's blocking invoke, once with async nodes going through ainvoke_llm.
+No API keys are needed, the fake model only sleeps for a fixed latency.
+
+Usage:
+    python benchmarks/async_llm_benchmark.py --sections 10 --latency 0.5
+"""
+import argparse
+import asyncio
+import operator
+import os
+import sys
+import time
+from typing import Annotated
+
+from typing_extensions import TypedDict
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import llm as llm_utils  # noqa: E402
+
+
+class SleepingLLM:
+    """Stand-in chat model that takes `latency` seconds per call."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def invoke(self, messages):
+        time.sleep(self.latency)
+        return "done"
+
+    async def ainvoke(self, messages, config=None):
+        await asyncio.sleep(self.latency)
+        return "done"
+
+
+class BenchState(TypedDict):
+    sections: list
+    completed_sections: Annotated[list, operator.add]
+
+
+def build_graph(llm: SleepingLLM, use_async: bool, calls_per_section: int):
+    """Planner -> Send() fan-out to one node per section -> END."""
+
+    def fan_out(state: BenchState):
+        return [Send("section", {"sections": [s], "completed_sections": []}) for s in state["sections"]]
+
+    def plan(state: BenchState):
+        return {}
+
+    if use_async:
+        async def section(state: BenchState):
+            for _ in range(calls_per_section):
+                await llm_utils.ainvoke_llm(llm, [])
+            return {"completed_sections": state["sections"]}
+    else:
+        def section(state: BenchState):
+            for _ in range(calls_per_section):
+                llm.invoke([])
+            return {"completed_sections": state["sections"]}
+
+    builder = StateGraph(BenchState)
+    builder.add_node("plan", plan)
+    builder.add_node("section", section)
+    builder.add_edge(START, "plan")
+    builder.add_conditional_edges("plan", fan_out, ["section"])
+    builder.add_edge("section", END)
+    return builder.compile()
+
+
+async def time_graph(graph, sections: int) -> float:
+    start = time.perf_counter()
+    await graph.ainvoke({"sections": list(range(sections)), "completed_sections": []})
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake LLM call")
+    parser.add_argument("--calls-per-section", type=int, default=2,
+                        help="LLM calls per section (generate_queries + write_section)")
+    parser.add_argument("--max-concurrency", type=int, default=llm_utils.LLM_MAX_CONCURRENCY)
+    parser.add_argument("--rps", type=float, default=0, help="LLM rate limit for the async path (0 = off)")
+    args = parser.parse_args()
+
+    llm_utils.LLM_MAX_CONCURRENCY = args.max_concurrency
+    llm_utils.LLM_RPS = args.rps
+    # Every call has the same (empty) prompt, which the response cache would answer
+    llm_utils.LLM_CACHE_MODE = "off"
+    llm = SleepingLLM(args.latency)
+    ideal = args.latency * args.calls_per_section
+
+    sync_time = await time_graph(build_graph(llm, False, args.calls_per_section), args.sections)
+    async_time = await time_graph(build_graph(llm, True, args.calls_per_section), args.sections)
+
+    print(f"sections={args.sections} latency={args.latency}s calls/section={args.calls_per_section} "
+          f"max_concurrency={args.max_concurrency} cpu_count={os.cpu_count()}")
+    print(f"{'mode':<22}{'wall time (s)':>15}{'x ideal':>10}")
+    print(f"{'sync invoke':<22}{sync_time:>15.2f}{sync_time / ideal:>10.1f}")
+    print(f"{'async ainvoke':<22}{async_time:>15.2f}{async_time / ideal:>10.1f}")
+    print(f"speedup: {sync_time / async_time:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,240 @@
+"""
+Deterministic local stand-ins for ChatOpenAI and the Tavily client, used by the benchmarks.
+
+FakeChatModel answers the structured Queries/ReportQueries/Sections calls with a plan of the configured shape
+and writes sections of a fixed number of tokens, streaming them with a configurable latency.
+FakeTavily returns pages of a configurable size with a configurable latency. The same query always
+returns the same results, and queries share part of a common URL pool so deduplication is exercised.
+"""
+import asyncio
+import random
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from pydantic import PrivateAttr
+
+from src.models.schemas import Queries, ReportQueries, SearchQuery, Section, SectionQueries, Sections
+from src.utils.tokens import count_tokens
+
+
+WORDS = (
+    "muscle protein synthesis training volume recovery sleep hypertrophy nutrition "
+    "progressive overload 2024 study https://example.com/research?id=42 table: 1.6g/kg"
+).split()
+
+
+def _seed(text: str) -> int:
+    """Stable seed for a piece of text (str hashes are salted per process)."""
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def make_text(size_bytes: int, seed: int) -> str:
+    """Synthetic prose of roughly size_bytes characters."""
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size_bytes:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def _prompt(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that sleeps `latency` seconds per call and answers without calling any API.
+    Plain calls return `output_tokens` words; structured calls return `queries_per_section`
+    queries (for each listed section, in batched query planning) or a plan with an introduction (depending on the first research section),
+    `sections` research sections and a conclusion (depending on all of them).
+    """
+    latency: float = 0.5
+    # Each call takes up to this fraction longer, so some sections finish later than others
+    latency_jitter: float = 0.0
+    output_tokens: int = 400
+    sections: int = 5
+    queries_per_section: int = 5
+    # Fraction of queries that reword one of a few common queries, as real query generators do
+    query_overlap: float = 0.0
+    # Fraction of research sections whose topic is one of the planner's queries, as a real plan follows its research
+    plan_overlap: float = 0.0
+    # Queries of the first structured Queries call, which is the planner's
+    _planner_queries: List[str] = PrivateAttr(default_factory=list)
+
+    # Reported as the model of every response, like the model routing's model names
+    model_name: str = "fake-chat"
+    # Caps the tokens of plain calls, like ChatOpenAI's max_tokens
+    max_tokens: Optional[int] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _usage(self, prompt: str, output_tokens: int) -> Dict[str, int]:
+        # Counted like the API does, so the metrics and the run's token budget see realistic usage
+        input_tokens = count_tokens(prompt)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _latency(self, prompt: str) -> float:
+        return self.latency * (1 + self.latency_jitter * random.Random(_seed(prompt)).random())
+
+    def _output_tokens(self, kwargs: Dict[str, Any]) -> int:
+        output_tokens = kwargs.get("output_tokens", self.output_tokens)
+        return min(output_tokens, self.max_tokens) if self.max_tokens is not None else output_tokens
+
+    def _words(self, prompt: str, count: int) -> List[str]:
+        rng = random.Random(_seed(prompt))
+        return [rng.choice(WORDS) for _ in range(count)]
+
+    def _queries(self, prompt: str) -> List[str]:
+        seed = _seed(prompt)
+        rng = random.Random(seed)
+        queries = []
+        for i in range(self.queries_per_section):
+            if rng.random() < self.query_overlap:
+                # The same words as common query i, in a different order
+                words = f"common query {i} {make_text(40, i)}".split()
+                rng.shuffle(words)
+                queries.append(" ".join(words))
+            else:
+                queries.append(f"query {seed % 10000} {i} {make_text(40, seed + i)}")
+        return queries
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError("FakeChatModel is async only, use ainvoke")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = _prompt(messages)
+        output_tokens = self._output_tokens(kwargs)
+        await asyncio.sleep(self._latency(prompt))
+        message = AIMessage(
+            content=" ".join(self._words(prompt, output_tokens)),
+            usage_metadata=self._usage(prompt, output_tokens),
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = _prompt(messages)
+        words = self._words(prompt, self._output_tokens(kwargs))
+        latency = self._latency(prompt)
+        # Spread the latency over 10 chunks, like a model streaming its answer
+        per_chunk = max(1, len(words) // 10)
+        for i in range(0, len(words), per_chunk):
+            await asyncio.sleep(latency / 10)
+            last = i + per_chunk >= len(words)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=" ".join(words[i:i + per_chunk]) + ("" if last else " "),
+                usage_metadata=self._usage(prompt, len(words)) if last else None,
+                response_metadata={"model_name": self.model_name} if last else {},
+            ))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        async def respond(messages: List[BaseMessage], config: RunnableConfig):
+            prompt = _prompt(messages)
+            # The "name: topic" lines of a batched query-planning prompt
+            listed = []
+            if schema is ReportQueries:
+                block = prompt.split('one per line as "name: topic":\n', 1)[-1].split("\n\n", 1)[0]
+                listed = [line for line in block.splitlines() if ": " in line]
+            # A plain call of the size of the structured answer, for its latency and usage accounting
+            answer_tokens = {
+                Queries: 15 * self.queries_per_section,
+                ReportQueries: 15 * self.queries_per_section * len(listed),
+            }.get(schema, 60 * (self.sections + 2))
+            await self.ainvoke(messages, config=config, output_tokens=answer_tokens)
+            if schema is ReportQueries:
+                return ReportQueries(sections=[
+                    SectionQueries(section_name=line.split(": ", 1)[0],
+                                   queries=[SearchQuery(search_query=query) for query in self._queries(line)])
+                    for line in listed
+                ])
+            if schema is Queries:
+                queries = self._queries(prompt)
+                if not self._planner_queries:
+                    self._planner_queries = queries
+                return Queries(queries=[SearchQuery(search_query=query) for query in queries])
+            if schema is Sections:
+                following = min(round(self.plan_overlap * self.sections), len(self._planner_queries))
+                return Sections(sections=[
+                    Section(name="Introduction", description="Overview of the topic", research=False, content="",
+                            depends_on=["Section 1"]),
+                    *[
+                        Section(name=f"Section {i + 1}",
+                                description=f"Aspect {i + 1}: "
+                                            + (self._planner_queries[i] if i < following else make_text(80, i)),
+                                research=True, content="")
+                        for i in range(self.sections)
+                    ],
+                    Section(name="Conclusion", description="Summary of the findings", research=False, content=""),
+                ])
+            raise ValueError(f"FakeChatModel has no structured output for {schema}")
+
+        return RunnableLambda(respond)
+
+
+class FakeTavily:
+    """
+    Stand-in for TavilySearchAPIWrapper.raw_results_async. Results are drawn from a pool of
+    `url_pool` URLs, so different queries return some of the same pages.
+    """
+
+    def __init__(self, latency: float = 0.3, page_kb: int = 50, url_pool: int = 200):
+        self.latency = latency
+        self.page_kb = page_kb
+        self.url_pool = url_pool
+        self.calls = 0
+
+    async def raw_results_async(
+        self,
+        query: str,
+        max_results: int = 5,
+        include_raw_content: bool = False,
+        **kwargs: Any
+    ) -> Dict:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        rng = random.Random(_seed(query))
+        results = []
+        for page in rng.sample(range(self.url_pool), min(max_results, self.url_pool)):
+            results.append({
+                "url": f"https://example.com/page/{page}",
+                "title": f"Page {page}",
+                "content": make_text(500, page),
+                "raw_content": make_text(self.page_kb * 1024, page) if include_raw_content else None,
+                "score": rng.random(),
+            })
+        return {"query": query, "results": results}
+
+
+def install_fakes(
+    llm: FakeChatModel,
+    tavily: FakeTavily,
+    model_latency: Optional[Dict[str, float]] = None
+) -> None:
+    """
+    Route the agents' LLM calls and Tavily searches to the fakes, bypassing the LLM and search caches.
+    Every model of the routing configuration gets a copy of `llm` under its name, with its latency
+    taken from `model_latency` when listed there.
+    """
+    from src.utils import llm as llm_utils
+    from src.utils import search
+    from src.utils.search import CachedTavilySearch, get_search_cache
+
+    for model in llm_utils.routed_models():
+        llm_utils.chat_models[model] = llm.model_copy(update={
+            "model_name": model, "latency": (model_latency or {}).get(model, llm.latency)
+        })
+    llm_utils.LLM_CACHE_MODE = "off"
+    search.tavily_search = CachedTavilySearch(tavily, get_search_cache(), mode="off")
@@ -0,0 +1,153 @@
+"""
+Connection reuse of the OpenAI and Tavily clients, measured against a local HTTP stand-in server.
+
+The stand-in answers POST /search in the Tavily format and POST /v1/chat/completions in the
+OpenAI format, and counts the TCP connections it accepts. The same workload (per section: a
+query-generation call, a batch of concurrent searches and a writing call, all sections at once,
+with the agent's default caps of 16 searches and 8 LLM calls in flight) runs twice:
+
+- separate clients: langchain's TavilySearchAPIWrapper, which opens a session per search, and
+  one ChatOpenAI client per agent module, each with its own connection pool
+- shared pool: TavilyClient and get_llm() over the shared client of src/utils/http.py
+
+Usage:
+    python benchmarks/http_pool_benchmark.py --sections 10 --queries 5 --server-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops bursts of connects, which then retry after a second
+    request_queue_size = 256
+
+    def __init__(self, latency: float):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real APIs
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        if self.path.endswith("/search"):
+            payload = {"query": body.get("query"), "results": [
+                {"url": f"https://example.com/{i}", "title": f"Page {i}", "content": "snippet", "score": 1.0}
+                for i in range(body.get("max_results", 5))
+            ]}
+        elif self.path.endswith("/chat/completions"):
+            payload = {
+                "id": "chatcmpl-standin", "object": "chat.completion", "created": 0, "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Stand-in response."}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+            }
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+async def workload(llms, search, args) -> None:
+    """Every section generates queries, searches them concurrently and writes, all sections at once."""
+    llm_slots = asyncio.Semaphore(args.max_llm_calls)
+    search_slots = asyncio.Semaphore(args.max_searches)
+
+    async def call_llm(llm, prompt: str):
+        async with llm_slots:
+            return await llm.ainvoke(prompt)
+
+    async def call_search(query: str):
+        async with search_slots:
+            return await search.raw_results_async(query)
+
+    async def section(i: int):
+        await call_llm(llms[0], f"queries for section {i}")
+        await asyncio.gather(*(call_search(f"section {i} query {q}") for q in range(args.queries)))
+        await call_llm(llms[1], f"write section {i}")
+
+    await asyncio.gather(*(section(i) for i in range(args.sections)))
+    await call_llm(llms[2], "write the conclusion")
+
+
+async def run_separate(server: StandInServer, args) -> float:
+    from langchain_community.utilities import tavily_search
+    from langchain_openai import ChatOpenAI
+
+    tavily_search.TAVILY_API_URL = server.url
+    llms = [ChatOpenAI(model="gpt-4o", base_url=f"{server.url}/v1", max_retries=0) for _ in range(3)]
+    start = time.perf_counter()
+    await workload(llms, tavily_search.TavilySearchAPIWrapper(), args)
+    return time.perf_counter() - start
+
+
+async def run_shared(server: StandInServer, args) -> float:
+    from src.utils import llm as llm_utils
+    from src.utils.search import TavilyClient
+
+    llm_utils.LLM_BASE_URL = f"{server.url}/v1"
+    llm = llm_utils.get_llm()
+    start = time.perf_counter()
+    await workload([llm, llm, llm], TavilyClient(base_url=server.url), args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=5, help="concurrent searches per section")
+    parser.add_argument("--max-searches", type=int, default=16, help="searches in flight at once")
+    parser.add_argument("--max-llm-calls", type=int, default=8, help="LLM calls in flight at once")
+    parser.add_argument("--server-latency", type=float, default=0.05, help="seconds the stand-in takes per request")
+    args = parser.parse_args()
+
+    from src.utils.http import get_http_pool_stats
+
+    for name, scenario in (("separate clients", run_separate), ("shared pool", run_shared)):
+        server = StandInServer(args.server_latency)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        wall = asyncio.run(scenario(server, args))
+        server.shutdown()
+        print(f"{name:<18} requests={server.requests:<5} connections={server.connections:<5} wall={wall:.3f}s")
+    print(f"shared pool stats: {get_http_pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
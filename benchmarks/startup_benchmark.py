@@ -0,0 +1,113 @@
+"""
+Startup profile of the CLI and library entry points.
+
+Each measurement runs in a fresh interpreter, since imports are cached for the life of a process:
+
+- import time of each entry module, from `python -X importtime`, with the packages that
+  contribute most to it (cumulative time of the most expensive module of each package)
+- time to first node: from interpreter start to the moment the workflow starts its first graph
+  node, which is what a short-lived worker pays before doing any work
+- `main.py --help`, which must work without API keys
+
+Usage:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 5 --top 15 --max-first-node 2.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_MODULES = ["src.agents.runner", "src.agents.streaming", "src.workflows.main_workflow"]
+
+FIRST_NODE_SCRIPT = """
+import asyncio, sys, time
+from src.workflows.main_workflow import create_main_workflow
+
+async def first_node():
+    agent = create_main_workflow()
+    async for _ in agent.astream({"topic": "startup"}, stream_mode="tasks"):
+        return time.time()
+
+print(asyncio.run(first_node()))
+"""
+
+
+def _env() -> Dict[str, str]:
+    # No API keys: nothing before the first node should need them
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "TAVILY_API_KEY")}
+    env["PYTHONPATH"] = ROOT
+    return env
+
+
+def import_profile(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Total import time of a module in seconds and the cumulative seconds of its heaviest top-level packages."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    )
+    packages: Dict[str, float] = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        seconds = int(cumulative) / 1e6
+        if name == module:
+            total = seconds
+        # A package costs as much as its most expensive module, which usually imports the rest
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0.0), seconds)
+    packages.pop(module.split(".")[0], None)
+    return total, sorted(packages.items(), key=lambda item: -item[1])
+
+
+def time_to_first_node() -> float:
+    """Seconds from starting the interpreter to the first graph node starting."""
+    start = time.time()
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_NODE_SCRIPT],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1]) - start
+
+
+def time_help() -> Tuple[float, int]:
+    """Seconds `main.py --help` takes and its exit status."""
+    start = time.time()
+    result = subprocess.run(
+        [sys.executable, "main.py", "--help"], cwd=ROOT, env=_env(), capture_output=True, text=True
+    )
+    return time.time() - start, result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--top", type=int, default=10, help="heaviest packages shown per entry module")
+    parser.add_argument("--max-first-node", type=float, help="exit with status 1 above this time to first node")
+    args = parser.parse_args()
+
+    for module in ENTRY_MODULES:
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        total = statistics.median(total for total, _ in profiles)
+        print(f"import {module:<32} {total:7.3f}s")
+        for package, seconds in profiles[-1][1][:args.top]:
+            print(f"    {package:<36} {seconds:7.3f}s")
+
+    first_node = statistics.median(time_to_first_node() for _ in range(args.runs))
+    help_time, help_status = time_help()
+    print(f"{'time to first node':<40} {first_node:7.3f}s")
+    print(f"{'main.py --help':<40} {help_time:7.3f}s (exit status {help_status})")
+
+    if help_status != 0 or (args.max_first_node is not None and first_node > args.max_first_node):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark for raw-content truncation in format_search_query_results.
+
+Compares the previous approach (load the encoder on every call, encode each whole
+page, keep the first max_tokens tokens) with src.utils.tokens.truncate_batch
+(cached encoder, prefix-only encoding, pages encoded in one batch) on large
+synthetic pages. A sequential prefix-only variant is included to separate the
+gain from prefix encoding from the gain from batching. Reports wall time, CPU
+time and peak memory traced by tracemalloc (Python heap, which includes the
+token lists returned by tiktoken).
+
+Usage:
+    python benchmarks/truncation_benchmark.py --pages 30 --page-kb 300 --max-tokens 4000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import tiktoken
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.tokens import get_encoding, truncate_batch, truncate_to_tokens  # noqa: E402
+
+
+WORDS = (
+    "muscle protein synthesis training volume recovery sleep hypertrophy nutrition "
+    "progressive overload 2024 study https://example.com/research?id=42 table: 1.6g/kg"
+).split()
+
+
+def make_page(size_bytes: int, rng: random.Random) -> str:
+    """Synthetic web page text of roughly size_bytes characters."""
+    words = []
+    length = 0
+    while length < size_bytes:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+        if rng.random() < 0.02:
+            words.append("\n\n")
+    return " ".join(words)
+
+
+def truncate_previous(pages, max_tokens):
+    """Truncation as format_search_query_results did it before the tokens utility."""
+    encoding = tiktoken.encoding_for_model("gpt-4")
+    results = []
+    for page in pages:
+        tokens = encoding.encode(page)
+        truncated_tokens = tokens[:max_tokens]
+        results.append(encoding.decode(truncated_tokens))
+    return results
+
+
+def truncate_prefix(pages, max_tokens):
+    return [truncate_to_tokens(page, max_tokens)[0] for page in pages]
+
+
+def truncate_current(pages, max_tokens):
+    return [text for text, _ in truncate_batch(pages, max_tokens)]
+
+
+def measure(fn, pages, max_tokens, repeat):
+    """Return (wall seconds, cpu seconds, peak traced MB, result) averaged over repeat runs."""
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        result = fn(pages, max_tokens)
+    cpu = (time.process_time() - cpu_start) / repeat
+    wall = (time.perf_counter() - wall_start) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return wall, cpu, peak / (1024 * 1024), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=30, help="pages per section (5 queries x 6 results)")
+    parser.add_argument("--page-kb", type=int, default=300, help="size of each synthetic page in KB")
+    parser.add_argument("--max-tokens", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = [make_page(args.page_kb * 1024, rng) for _ in range(args.pages)]
+    # Load the encoding file once up front so neither side pays the first download
+    get_encoding()
+
+    prev = measure(truncate_previous, pages, args.max_tokens, args.repeat)
+    seq = measure(truncate_prefix, pages, args.max_tokens, args.repeat)
+    curr = measure(truncate_current, pages, args.max_tokens, args.repeat)
+    assert prev[3] == seq[3] == curr[3], "truncated output differs between implementations"
+
+    print(f"pages={args.pages} page_size={args.page_kb}KB max_tokens={args.max_tokens} repeat={args.repeat}")
+    print(f"{'implementation':<28}{'wall (s)':>10}{'cpu (s)':>10}{'peak MB':>10}")
+    print(f"{'full encode per page':<28}{prev[0]:>10.3f}{prev[1]:>10.3f}{prev[2]:>10.1f}")
+    print(f"{'prefix, sequential':<28}{seq[0]:>10.3f}{seq[1]:>10.3f}{seq[2]:>10.1f}")
+    print(f"{'prefix + encode_batch':<28}{curr[0]:>10.3f}{curr[1]:>10.3f}{curr[2]:>10.1f}")
+    print(f"cpu speedup (batch): {prev[1] / max(curr[1], 1e-9):.1f}x, "
+          f"peak memory (sequential): {prev[2] / max(seq[2], 1e-9):.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+End-to-end benchmark of the report workflow with local stand-ins for OpenAI and Tavily.
+
+Runs the full create_main_workflow() graph (plan, per-section research and writing, final
+sections, compilation) against FakeChatModel and FakeTavily from benchmarks/fakes.py, so no API
+keys or network are needed and the results are deterministic. Reports wall time, process CPU
+time, peak memory traced by tracemalloc and the CPU time spent in the formatters, taken from the
+run instrumentation.
+
+Thresholds make the script usable as a CI regression check: it exits with status 1 when a
+measurement exceeds its --max-* limit.
+
+Usage:
+    python benchmarks/workflow_benchmark.py --sections 5 --queries 5 --page-kb 50
+    python benchmarks/workflow_benchmark.py --llm-latency 0 --search-latency 0 --max-wall-time 20 --json out.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The clients are never created (install_fakes replaces the shared chat model and Tavily wrapper),
+# but a configured environment should not be needed to import the workflow either
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+from benchmarks.fakes import FakeChatModel, FakeTavily, install_fakes  # noqa: E402
+from src.agents import report_planner  # noqa: E402
+from src.agents.runner import _run  # noqa: E402
+from src.utils import llm as llm_utils  # noqa: E402
+from src.utils.llm import print_model_usage  # noqa: E402
+from src.utils import search  # noqa: E402
+from src.utils.manifest import Regeneration, RunManifest, manifest_path  # noqa: E402
+from src.utils.token_budget import TokenBudget  # noqa: E402
+from src.workflows.main_workflow import create_main_workflow  # noqa: E402
+from src.utils.tokens import get_encoding  # noqa: E402
+
+
+async def run_scenario(args) -> dict:
+    """Run the workflow once and return the measurements."""
+    llm = FakeChatModel(
+        latency=args.llm_latency,
+        latency_jitter=args.llm_latency_jitter,
+        output_tokens=args.output_tokens,
+        sections=args.sections,
+        queries_per_section=args.queries,
+        query_overlap=args.query_overlap,
+        plan_overlap=args.plan_overlap,
+    )
+    tavily = FakeTavily(latency=args.search_latency, page_kb=args.page_kb, url_pool=args.url_pool)
+    llm_utils.LLM_NODE_MODELS = dict(part.split("=", 1) for part in args.node_models.split(",") if "=" in part)
+    install_fakes(llm, tavily, model_latency={
+        model: args.routed_latency for model in llm_utils.routed_models() if model != llm_utils.LLM_MODEL
+    } if args.routed_latency is not None else None)
+    report_planner.SPECULATIVE_RESEARCH = "on" if args.speculative else "off"
+    agent = create_main_workflow(scheduling=args.scheduling, query_planning=args.query_planning)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        tracemalloc.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = await _run(
+            "Benchmark topic", verbose=False, thread_id=None, agent=agent,
+            output_path=os.path.join(output_dir, "report.md"), show_report=False,
+            budget=TokenBudget(args.max_input_tokens, args.max_output_tokens, args.deadline)
+        )
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        searches = tavily.calls
+
+        # Incremental regeneration of the report with one section's description edited
+        regeneration = {}
+        if args.regenerate:
+            output_path = os.path.join(output_dir, "report.md")
+            regenerate_start = time.perf_counter()
+            regenerated = await _run(
+                "Benchmark topic", verbose=False, thread_id=None, agent=agent, output_path=output_path,
+                show_report=False, regeneration=Regeneration(
+                    RunManifest.load(manifest_path(output_path)),
+                    edits={args.regenerate: "Edited description: " + args.regenerate}
+                )
+            )
+            regeneration = {
+                "wall_time_s": round(time.perf_counter() - regenerate_start, 3),
+                "searches": tavily.calls - searches,
+                **regenerated["stats"]["regeneration"],
+            }
+
+    spans = result["stats"]["metrics"]["spans"]
+    return {
+        "wall_time_s": round(wall, 3),
+        "cpu_time_s": round(cpu, 3),
+        "peak_memory_mb": round(peak / (1024 * 1024), 1),
+        "formatter_cpu_s": round(sum(e["cpu_s"] for e in spans if e["kind"] == "format"), 3),
+        "llm_calls": sum(e["count"] - e["cached"] for e in spans if e["kind"] == "llm"),
+        "section_input_tokens": sum(
+            e["input_tokens"] for e in spans if e["kind"] == "llm" and e["name"] == "write_section"
+        ),
+        "query_input_tokens": sum(
+            e["input_tokens"] for e in spans
+            if e["kind"] == "llm" and e["name"] in ("generate_queries", "plan_section_queries")
+        ),
+        "final_input_tokens": sum(
+            e["input_tokens"] for e in spans if e["kind"] == "llm" and e["name"] == "write_final_sections"
+        ),
+        "searches": searches,
+        "searches_saved": result["stats"]["queries"]["saved"],
+        "escalated_searches": sum(d["escalated"] for d in result["stats"]["search_decisions"].values()),
+        "report_chars": len(result["final_report"] or ""),
+        "final_sections_saved_s": result["stats"]["metrics"]["critical_path"].get("saved_s", 0.0),
+        "speculative_saved_s": result["stats"]["speculation"].get("max_saved_s", 0.0),
+        "speculative_wasted_searches": result["stats"]["speculation"].get("wasted_searches", 0),
+        "documents": result["stats"]["documents"],
+        "speculation": result["stats"]["speculation"],
+        "llm_usage": result["stats"]["llm_usage"],
+        "regeneration": regeneration,
+        "budget": result["stats"]["budget"],
+        "input_tokens": result["stats"]["budget"]["input_tokens"],
+        "output_tokens": result["stats"]["budget"]["output_tokens"],
+        "sections_degraded": len(result["stats"]["budget"]["degraded"]),
+        "sections_not_written": len(result["stats"]["budget"]["refused"]),
+        "regenerate_wall_time_s": regeneration.get("wall_time_s", 0.0),
+        "sections_rewritten": len(regeneration.get("rerun", [])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=5, help="research sections in the plan")
+    parser.add_argument("--queries", type=int, default=5, help="search queries per section (and for the plan)")
+    parser.add_argument("--query-overlap", type=float, default=0.0,
+                        help="fraction of generated queries that reword a query shared with other sections")
+    parser.add_argument("--plan-overlap", type=float, default=0.5,
+                        help="fraction of research sections whose topic is one of the planner's queries")
+    parser.add_argument("--speculative", action="store_true",
+                        help="research probable sections while the plan is generated, see SPECULATIVE_RESEARCH")
+    parser.add_argument("--page-kb", type=int, default=50, help="raw content size of each search result in KB")
+    parser.add_argument("--url-pool", type=int, default=200, help="distinct URLs the fake search draws from")
+    parser.add_argument("--output-tokens", type=int, default=400, help="tokens per written section")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake LLM call")
+    parser.add_argument("--llm-latency-jitter", type=float, default=0.0,
+                        help="make each LLM call up to this fraction slower, so sections finish at different times")
+    parser.add_argument("--scheduling", choices=["barrier", "eager"], default="barrier",
+                        help="how final sections are scheduled, see SECTION_SCHEDULING")
+    parser.add_argument("--query-planning", choices=["section", "batched"], default="section",
+                        help="one query-generation call per section or batched after the plan, see QUERY_PLANNING")
+    parser.add_argument("--regenerate", metavar="SECTION",
+                        help="then regenerate the report incrementally with this section's description edited")
+    parser.add_argument("--max-input-tokens", type=int, help="run token budget for LLM input, see RUN_MAX_INPUT_TOKENS")
+    parser.add_argument("--max-output-tokens", type=int,
+                        help="run token budget for LLM output, see RUN_MAX_OUTPUT_TOKENS")
+    parser.add_argument("--deadline", type=float, help="seconds the run may take, see RUN_DEADLINE_SECONDS")
+    parser.add_argument("--node-models", default="",
+                        help="model routing, e.g. generate_queries=gpt-4o-mini, see LLM_NODE_MODELS")
+    parser.add_argument("--routed-latency", type=float,
+                        help="seconds per fake LLM call for the models routed by --node-models (default: --llm-latency)")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="seconds per fake search")
+    parser.add_argument("--max-wall-time", type=float, help="fail if the wall time exceeds this (s)")
+    parser.add_argument("--max-peak-mb", type=float, help="fail if the traced peak memory exceeds this (MB)")
+    parser.add_argument("--max-formatter-cpu", type=float, help="fail if formatter CPU time exceeds this (s)")
+    parser.add_argument("--json", help="also write the measurements to this file")
+    args = parser.parse_args()
+
+    # Measure the workflow, not the provider rate limits
+    llm_utils.LLM_RPS = 0
+    search.SEARCH_RPS = 0
+    # Load the encoding file up front so the first formatter call does not pay for it
+    get_encoding()
+
+    results = asyncio.run(run_scenario(args))
+    results["scenario"] = {
+        "sections": args.sections, "queries": args.queries, "query_overlap": args.query_overlap, "page_kb": args.page_kb,
+        "output_tokens": args.output_tokens, "llm_latency": args.llm_latency,
+        "search_latency": args.search_latency, "scheduling": args.scheduling, "query_planning": args.query_planning,
+        "plan_overlap": args.plan_overlap, "speculative": args.speculative,
+        "node_models": args.node_models, "routed_latency": args.routed_latency, "regenerate": args.regenerate,
+        "max_input_tokens": args.max_input_tokens, "max_output_tokens": args.max_output_tokens,
+        "deadline": args.deadline,
+    }
+
+    print(f"sections={args.sections} queries/section={args.queries} page_size={args.page_kb}KB "
+          f"llm_latency={args.llm_latency}s search_latency={args.search_latency}s "
+          f"scheduling={args.scheduling} query_planning={args.query_planning} cpu_count={os.cpu_count()}")
+    for key in ("wall_time_s", "cpu_time_s", "peak_memory_mb", "formatter_cpu_s", "llm_calls",
+                "query_input_tokens", "section_input_tokens", "final_input_tokens", "searches", "searches_saved",
+                "escalated_searches", "final_sections_saved_s", "speculative_saved_s", "speculative_wasted_searches",
+                "regenerate_wall_time_s", "sections_rewritten", "input_tokens", "output_tokens",
+                "sections_degraded", "sections_not_written", "report_chars"):
+        print(f"{key:<28}{results[key]:>12}")
+    print_model_usage(results["llm_usage"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failures = [
+        f"{name} {results[key]} > {limit}"
+        for name, key, limit in (
+            ("wall time", "wall_time_s", args.max_wall_time),
+            ("peak memory", "peak_memory_mb", args.max_peak_mb),
+            ("formatter cpu", "formatter_cpu_s", args.max_formatter_cpu),
+        )
+        if limit is not None and results[key] > limit
+    ]
+    if failures:
+        print("Regression: " + ", ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,34 +4,94 @@ Main entry point for the Deep Research Agent.
 This is a refactored version of the original main_single.py file,
 now organized into a clean, production-ready structure.
 """
+import argparse
 import asyncio
 from dotenv import load_dotenv
 import os
 
-from src.agents.runner import run_research_agent
-
 
 def setup_environment():
     """Setup environment variables and configuration."""
     # Load .env file
     load_dotenv()
     
-    # Set environment variables
-    os.environ['OPENAI_API_KEY'] = os.getenv("OPENAI_KEY")
-    os.environ['TAVILY_API_KEY'] = os.getenv("TAVILY_API_KEY")
+    # Set environment variables, keeping values that are already set when the .env file has none
+    for name, source in (('OPENAI_API_KEY', 'OPENAI_KEY'), ('TAVILY_API_KEY', 'TAVILY_API_KEY')):
+        value = os.getenv(source)
+        if value:
+            os.environ[name] = value
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run the deep research agent.")
+    parser.add_argument("--thread-id", help="Checkpoint the run under this id so it can be resumed")
+    parser.add_argument("--resume", metavar="THREAD_ID", help="Resume a checkpointed run from its last completed step")
+    parser.add_argument("--regenerate", metavar="MANIFEST",
+                        help="Regenerate a previous report from its manifest, writing only the sections that changed")
+    parser.add_argument("--edit", action="append", default=[], metavar="SECTION=DESCRIPTION",
+                        help="With --regenerate, give a section a new description (repeatable)")
+    parser.add_argument("--refresh", action="append", default=[], metavar="SECTION",
+                        help="With --regenerate, write a section again even if it did not change (repeatable)")
+    parser.add_argument("--max-input-tokens", type=int, help="LLM input tokens the run may spend")
+    parser.add_argument("--max-output-tokens", type=int, help="LLM output tokens the run may spend")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS", help="Seconds the run may take")
+    parser.add_argument("--batch", metavar="TOPICS_FILE", help="Research every topic in a JSONL or CSV file")
+    parser.add_argument("--output-dir", default="outputs/batch", help="Directory for batch reports")
+    parser.add_argument("--concurrency", type=int, default=4, help="Topics researched at once in batch mode")
+    parser.add_argument("--max-llm-calls", type=int, help="LLM calls in flight at once, across all topics")
+    parser.add_argument("--max-searches", type=int, help="Searches in flight at once, across all topics")
+    return parser.parse_args()
 
 
 async def main():
     """Main function to run the deep research agent."""
+    args = parse_args()
+
     # Setup environment
     setup_environment()
-    
+
+    if args.batch:
+        from src.agents.batch_runner import load_topics, run_batch_research
+        from src.utils import llm, search
+
+        if args.max_llm_calls:
+            llm.LLM_MAX_CONCURRENCY = args.max_llm_calls
+        if args.max_searches:
+            search.SEARCH_MAX_CONCURRENCY = args.max_searches
+        await run_batch_research(
+            load_topics(args.batch),
+            output_dir=args.output_dir,
+            max_concurrent_topics=args.concurrency
+        )
+        return
+
+    # Imported here so `--help` and argument errors do not load the agent stack
+    from src.agents.runner import regenerate_research_agent, run_research_agent, resume_research_agent
+
+    if args.regenerate:
+        edits = dict(edit.split("=", 1) for edit in args.edit)
+        result = await regenerate_research_agent(args.regenerate, edits=edits, refresh=args.refresh)
+        print(result["stats"])
+        return
+
+    if args.resume:
+        result = await resume_research_agent(thread_id=args.resume, verbose=False)
+        print(result["stats"])
+        return
+
     # Define the topic for research
     topic = "Detailed report on key to muscle building and health life style"
     
+    # Token budget and deadline from the command line, else from RUN_MAX_INPUT_TOKENS etc.
+    budget = None
+    if args.max_input_tokens or args.max_output_tokens or args.deadline:
+        from src.utils.token_budget import TokenBudget
+        budget = TokenBudget(args.max_input_tokens, args.max_output_tokens, args.deadline)
+
     # Run the research agent
-    result = await run_research_agent(topic=topic, verbose=False)
-    print(result)
+    result = await run_research_agent(topic=topic, verbose=False, thread_id=args.thread_id, budget=budget)
+    print(result["stats"])
 
 
 if __name__ == "__main__":
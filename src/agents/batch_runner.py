@@ -0,0 +1,103 @@
+"""
+Batch runner: research many topics in one process.
+"""
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List
+
+from src.workflows.main_workflow import create_main_workflow
+from src.agents.runner import _run
+
+
+def load_topics(path: str) -> List[Dict[str, str]]:
+    """
+    Load topics from a JSONL or CSV file.
+    JSONL lines are either a string or an object with a "topic" key (and optional "id").
+    CSV files use a "topic" column (and optional "id" column), or their first column.
+    """
+    topics = []
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.reader(f))
+            if rows and "topic" in rows[0]:
+                header = rows[0]
+                topics = [dict(zip(header, row)) for row in rows[1:]]
+            else:
+                topics = [{"topic": row[0]} for row in rows if row]
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                topics.append(item if isinstance(item, dict) else {"topic": str(item)})
+
+    return [t for t in topics if t.get("topic")]
+
+
+def slugify(text: str, max_length: int = 60) -> str:
+    """Turn a topic into a file name."""
+    slug = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+    return slug[:max_length].rstrip("-") or "topic"
+
+
+async def run_batch_research(
+    topics: List[Dict[str, str]],
+    output_dir: str = "outputs/batch",
+    max_concurrent_topics: int = 4
+) -> List[Dict[str, Any]]:
+    """
+    Research every topic with one compiled workflow and the shared LLM and Tavily clients.
+    At most max_concurrent_topics run at once; LLM calls and searches are further capped process-wide
+    by LLM_MAX_CONCURRENCY and SEARCH_MAX_CONCURRENCY. Each report is written to its own file in
+    output_dir and a per-topic summary is returned (and saved as summary.json).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    reporter_agent = create_main_workflow()
+    topic_slots = asyncio.Semaphore(max_concurrent_topics)
+    batch_start = time.perf_counter()
+
+    async def research(index: int, item: Dict[str, str]) -> Dict[str, Any]:
+        topic = item["topic"]
+        name = slugify(item.get("id") or topic)
+        output_path = os.path.join(output_dir, f"{index:03d}-{name}.md")
+        async with topic_slots:
+            print(f'--- Researching topic {index}: {topic} ---')
+            start = time.perf_counter()
+            try:
+                result = await _run(
+                    topic, verbose=False, thread_id=None,
+                    agent=reporter_agent, output_path=output_path, show_report=False
+                )
+                status, error, stats = "ok", None, result["stats"]
+            except Exception as e:
+                print(f"Error researching topic '{topic}': {e}")
+                status, error, stats = "failed", str(e), {}
+            wall_time = time.perf_counter() - start
+            print(f'--- Researching topic {index} {status} in {wall_time:.1f}s ---')
+
+        return {
+            "topic": topic,
+            "output": output_path if status == "ok" else None,
+            "status": status,
+            "error": error,
+            "wall_time_s": round(wall_time, 2),
+            "stats": stats,
+        }
+
+    summary = await asyncio.gather(*(research(i, item) for i, item in enumerate(topics, 1)))
+
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print('='*50)
+    print(f"{'#':>3}  {'status':<7}{'wall (s)':>9}  topic")
+    for i, entry in enumerate(summary, 1):
+        print(f"{i:>3}  {entry['status']:<7}{entry['wall_time_s']:>9.1f}  {entry['topic']}")
+    print(f"Batch of {len(summary)} topics finished in {time.perf_counter() - batch_start:.1f}s")
+
+    return summary
@@ -1,21 +1,76 @@
 """
 Final section writer for introduction and conclusion sections.
 """
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from src.models.schemas import SectionState
 from src.agents.prompts import FINAL_SECTION_WRITER_PROMPT
+from src.agents.section_digester import SECTION_DIGEST_MODE, SECTION_DIGEST_TOKENS, FINAL_SECTION_CONTEXT_TOKENS
+from src.utils.formatters import format_section_digests, format_sections
+from src.utils.llm import ainvoke_llm, get_llm, model_for_node
+from src.utils.manifest import fingerprint
+from src.utils.metrics import trace
+from src.utils.run_context import get_run_context
+from src.utils.token_budget import unwritten_section
+from src.utils.tokens import count_tokens, truncate_to_tokens
 
 
-llm = ChatOpenAI(model_name="gpt-4o", temperature=0)
+async def wait_for_research_sections(section, depends_on):
+    """
+    Wait until the research sections this section depends on are written and format them as context.
+    Used by eager scheduling, where final sections are started together with the research sections.
+    """
+    print('--- Waiting for Sections: ' + ', '.join(depends_on) + ' ---')
+    tracker = get_run_context().sections
+    with trace("wait_for_sections", "wait", section=section.name, depends_on=list(depends_on)):
+        completed_sections = await tracker.wait_for(depends_on)
+    if SECTION_DIGEST_MODE == "off":
+        return format_sections(completed_sections)
+    return format_section_digests(completed_sections, tracker.digests, max_total_tokens=FINAL_SECTION_CONTEXT_TOKENS)
 
 
-def write_final_sections(state: SectionState):
+async def write_final_sections(state: SectionState):
     """Write the final sections of the report, which do not require web search and use the completed sections as context"""
     # Get state
     section = state["section"]
-    completed_report_sections = state["report_sections_from_research"]
+    run = get_run_context()
+    if "report_sections_from_research" in state:
+        completed_report_sections = state["report_sections_from_research"]
+        depends_on = [s.name for s in run.manifest.sections if s.research]
+    else:
+        completed_report_sections = await wait_for_research_sections(section, state["depends_on"])
+        depends_on = state["depends_on"]
+
+    # Under a token budget, the section's share may shorten its context
+    allocation = None
+    if run.budget.limited:
+        allocation = run.budget.allocate(section.name, count_tokens(completed_report_sections))
+        if allocation.degraded and not allocation.refused:
+            completed_report_sections = truncate_to_tokens(completed_report_sections, allocation.context_tokens)[0]
+
+    # Incremental runs keep the previous content unless a research section it uses was rewritten
+    section_fingerprint = fingerprint(
+        section.name, section.description, run.manifest.content_fingerprints(depends_on),
+        SECTION_DIGEST_MODE, SECTION_DIGEST_TOKENS, FINAL_SECTION_CONTEXT_TOKENS,
+        allocation.fingerprint_part() if allocation is not None else None,
+        FINAL_SECTION_WRITER_PROMPT, model_for_node("write_final_sections")
+    )
+    regeneration = run.regeneration
+    if regeneration is not None:
+        content = regeneration.reuse(section, section_fingerprint)
+        if content is not None:
+            print('--- Reusing Final Section: '+ section.name + ' ---')
+            section.content = content
+            run.manifest.record(section, section_fingerprint, content)
+            run.budget.settle(section.name)
+            return {"completed_sections": [section]}
+
+    # Sections the token budget or deadline did not leave room for get a placeholder, which is not
+    # recorded in the manifest so a later run writes them
+    if allocation is not None and allocation.refused:
+        print('--- Not Writing Final Section: '+ section.name + ' (' + allocation.refused + ') ---')
+        section.content = unwritten_section(section.name, allocation.refused)
+        return {"completed_sections": [section]}
 
     print('--- Writing Final Section: '+ section.name + ' ---')
 
@@ -28,13 +83,17 @@ def write_final_sections(state: SectionState):
 
     # Generate section
     user_instruction = "Craft a report section based on the provided sources."
-    section_content = llm.invoke([
+    use_cache = regeneration is None or regeneration.use_cache(section)
+    section_content = await ainvoke_llm(get_llm("write_final_sections"), [
         SystemMessage(content=system_instructions),
         HumanMessage(content=user_instruction)
-    ])
+    ], config={"metadata": {"section_name": section.name}}, cache=use_cache,
+        max_tokens=allocation.max_output_tokens if allocation is not None else None)
+    run.budget.settle(section.name)
 
     # Write content to section
     section.content = section_content.content
+    run.manifest.record(section, section_fingerprint, section.content)
 
     print('--- Writing Final Section: '+ section.name + ' Completed ---')
 
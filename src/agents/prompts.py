@@ -57,6 +57,7 @@ Now, generate the sections of the report. Each section should have the following
 - Description - Brief overview of the main topics and concepts to be covered in this section.
 - Research - Whether to perform web search for this section of the report or not.
 - Content - The content of the section, which you will leave blank for now.
+- Depends on - For sections without research, the names of the research sections it draws on. Leave it empty if it needs all of them.
 
 Consider which sections require web search.
 For example, introduction and conclusion will not require research because they will distill information from other parts of the report.
@@ -80,6 +81,27 @@ Your queries should be:
 - Diverse enough to cover all aspects of the section plan
 - Focused on authoritative sources (documentation, technical blogs, academic papers)"""
 
+REPORT_SECTIONS_QUERY_GENERATOR_PROMPT = """Your goal is to generate targeted web search queries that will gather comprehensive information for writing several sections of a technical report.
+
+The overall topic of the report is:
+{topic}
+
+The sections to research, one per line as "name: topic":
+{sections}
+
+For each section, generate {number_of_queries} search queries and return them under the section's name, exactly as given above. When generating the queries of a section, ensure that they:
+1. Cover different aspects of the section's topic (e.g., core features, real-world applications, technical architecture)
+2. Include specific technical terms related to the section's topic
+3. Target recent information by including year markers where relevant (e.g., "2024")
+4. Look for comparisons or differentiators from similar technologies/approaches
+5. Search for both official documentation and practical implementation examples
+
+Your queries should be:
+- Specific enough to avoid generic results
+- Technical enough to capture detailed implementation information
+- Diverse enough to cover all aspects of each section plan, without repeating the queries of other sections
+- Focused on authoritative sources (documentation, technical blogs, academic papers)"""
+
 SECTION_WRITER_PROMPT = r"""You are an expert technical writer crafting one specific section of a technical report.
 
 Title for the section:
@@ -189,3 +211,18 @@ For Conclusion/Summary:
 - Do not include word count or any preamble in your response
 - If there are special characters in the text, such as the dollar symbol,
   ensure they are escaped properly for correct rendering e.g $25.5 should become \$25.5"""
+
+SECTION_DIGEST_PROMPT = """You are condensing one section of a technical report so that other sections can refer to it.
+
+Title of the section:
+{section_title}
+
+Content of the section:
+{section_content}
+
+Write a digest of at most {max_words} words that keeps:
+- The main claims and conclusions of the section
+- Key numbers, names, dates and comparisons
+- Terms the introduction or conclusion of the report may need
+
+Write plain sentences or short bullet points, without headings, sources or any preamble."""
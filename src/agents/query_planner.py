@@ -0,0 +1,97 @@
+"""
+Batched query planning: the search queries of every research section, generated right after the plan.
+
+Instead of one query-generation call per section subgraph, the research sections are sent to the
+model together (in chunks of QUERY_BATCH_SIZE, run concurrently), and each section subgraph starts
+at its web search with the planned queries. Sections the model left out of its answer, or whose
+chunk failed, generate their own queries as before.
+"""
+import asyncio
+import os
+from typing import Dict, List
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.models.schemas import ReportQueries, ReportState, SearchQuery, Section
+from src.utils.llm import ainvoke_llm, get_llm
+from src.utils.run_context import get_run_context
+from src.agents.prompts import REPORT_SECTIONS_QUERY_GENERATOR_PROMPT
+
+
+# How section queries are generated: "section" (one call per section subgraph) or "batched"
+# (one call for all research sections after the plan, see plan_section_queries)
+QUERY_PLANNING = os.getenv("QUERY_PLANNING", "section")
+# Research sections per batched query-planning call; larger plans are split into concurrent calls
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "10"))
+
+
+def _normalize(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+async def generate_batch_queries(
+    topic: str,
+    sections: List[Section],
+    cache: bool = True
+) -> Dict[str, List[SearchQuery]]:
+    """Generate the search queries of several sections in one call, by section name."""
+    number_of_queries = 5
+
+    # Format system instructions
+    system_instructions = REPORT_SECTIONS_QUERY_GENERATOR_PROMPT.format(
+        topic=topic,
+        sections="\n".join(f"{section.name}: {section.description}" for section in sections),
+        number_of_queries=number_of_queries
+    )
+
+    # Generate queries
+    user_instruction = "Generate search queries for each of the provided sections."
+    results = await ainvoke_llm(get_llm("plan_section_queries"), [
+        SystemMessage(content=system_instructions),
+        HumanMessage(content=user_instruction)
+    ], schema=ReportQueries, cache=cache)
+
+    # Answers are matched to the sections by name, ignoring case and spacing
+    names = {_normalize(section.name): section.name for section in sections}
+    planned = {}
+    for answer in results.sections:
+        name = names.get(_normalize(answer.section_name))
+        if name is not None and answer.queries and name not in planned:
+            planned[name] = answer.queries[:number_of_queries]
+    return planned
+
+
+async def plan_section_queries(state: ReportState):
+    """Generate the search queries of all research sections in batched calls"""
+    # Sections that took over speculative research, or keep their queries in an incremental run,
+    # already have their queries
+    run = get_run_context()
+    sections = [
+        s for s in state["sections"]
+        if s.research and s.name not in run.speculation.kept
+        and (run.regeneration is None or run.regeneration.queries(s) is None)
+    ]
+    if not sections:
+        return {"section_queries": {}}
+
+    print('--- Planning Search Queries for ' + str(len(sections)) + ' Sections ---')
+    chunks = [sections[i:i + QUERY_BATCH_SIZE] for i in range(0, len(sections), QUERY_BATCH_SIZE)]
+    results = await asyncio.gather(
+        *(generate_batch_queries(
+            state["topic"], chunk,
+            cache=run.regeneration is None or all(run.regeneration.use_cache(s) for s in chunk)
+        ) for chunk in chunks),
+        return_exceptions=True
+    )
+
+    section_queries = {}
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            print(f"Error in plan_section_queries, {len(chunk)} sections will generate their own queries: {result}")
+            continue
+        section_queries.update(result)
+
+    missing = len(sections) - len(section_queries)
+    print('--- Planning Search Queries Completed'
+          + (f', {missing} Sections Will Generate Their Own' if missing else '') + ' ---')
+    return {"section_queries": section_queries}
@@ -2,7 +2,8 @@
 Report compilation and formatting functions.
 """
 from src.models.schemas import ReportState
-from src.utils.formatters import format_sections
+from src.utils.formatters import format_section_digests, format_sections
+from src.agents.section_digester import SECTION_DIGEST_MODE, FINAL_SECTION_CONTEXT_TOKENS
 
 
 def format_completed_sections(state: ReportState):
@@ -12,8 +13,16 @@ def format_completed_sections(state: ReportState):
     # List of completed sections
     completed_sections = state["completed_sections"]
 
-    # Format completed section to str to use as context for final sections
-    completed_report_sections = format_sections(completed_sections)
+    # Format completed section to str to use as context for final sections,
+    # from their digests unless digests are turned off
+    if SECTION_DIGEST_MODE == "off":
+        completed_report_sections = format_sections(completed_sections)
+    else:
+        completed_report_sections = format_section_digests(
+            completed_sections,
+            state.get("section_digests", {}),
+            max_total_tokens=FINAL_SECTION_CONTEXT_TOKENS
+        )
 
     print('--- Formatting Completed Sections is Done ---')
 
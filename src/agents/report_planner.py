@@ -1,12 +1,23 @@
 """
 Report planning agent functions.
 """
-from langchain_openai import ChatOpenAI
+import asyncio
+from typing import List
+
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from src.models.schemas import ReportState, Queries, Sections, SearchQuery
-from src.utils.search import run_search_queries
-from src.utils.formatters import format_search_query_results
+from src.models.schemas import ReportState, Queries, Section, Sections, SearchQuery
+from src.utils.search import run_adaptive_search_queries
+from src.utils.formatters import build_prompt, iter_search_query_results
+from src.utils.llm import ainvoke_llm, get_llm
+from src.utils.run_context import get_run_context
+from src.agents.section_builder import section_context_tokens
+from src.agents.section_digester import FINAL_SECTION_CONTEXT_TOKENS
+from src.agents.speculative_research import (
+    SPECULATIVE_RESEARCH,
+    resolve_speculative_research,
+    start_speculative_research
+)
 from src.agents.prompts import (
     DEFAULT_REPORT_STRUCTURE,
     REPORT_PLAN_QUERY_GENERATOR_PROMPT,
@@ -14,19 +25,33 @@ from src.agents.prompts import (
 )
 
 
-llm = ChatOpenAI(model_name="gpt-4o", temperature=0)
+def plan_token_budget(sections: List[Section]) -> None:
+    """Register the sections of the plan with the run's token budget, so each gets its share of it."""
+    get_run_context().budget.plan({
+        s.name: section_context_tokens() if s.research else FINAL_SECTION_CONTEXT_TOKENS
+        for s in sections
+    })
 
 
 async def generate_report_plan(state: ReportState):
     """Generate the overall plan for building the report"""
     topic = state["topic"]
+    run = get_run_context()
+    run.manifest.topic = topic
+
+    # Incremental runs keep the plan of the run they regenerate
+    if run.regeneration is not None:
+        print('--- Reusing Report Plan ---')
+        sections = run.regeneration.plan()
+        run.manifest.set_plan(sections)
+        plan_token_budget(sections)
+        return {"sections": sections}
+
     print('--- Generating Report Plan ---')
 
     report_structure = DEFAULT_REPORT_STRUCTURE
     number_of_queries = 8
 
-    structured_llm = llm.with_structured_output(Queries)
-
     system_instructions_query = REPORT_PLAN_QUERY_GENERATOR_PROMPT.format(
         topic=topic,
         report_organization=report_structure,
@@ -35,10 +60,10 @@ async def generate_report_plan(state: ReportState):
 
     try:
         # Generate queries
-        results = structured_llm.invoke([
+        results = await ainvoke_llm(get_llm("generate_report_plan"), [
             SystemMessage(content=system_instructions_query),
             HumanMessage(content='Generate search queries that will help with planning the sections of the report.')
-        ])
+        ], schema=Queries)
 
         # Convert SearchQuery objects to strings
         query_list = [
@@ -47,37 +72,49 @@ async def generate_report_plan(state: ReportState):
         ]
 
         # Search web and ensure we wait for results
-        search_docs = await run_search_queries(
+        search_docs = await run_adaptive_search_queries(
             query_list,
             num_results=5,
-            include_raw_content=False
+            include_raw_content=False,
+            label="report_plan"
         )
 
         if not search_docs:
             print("Warning: No search results returned")
-            search_context = "No search results available."
+            search_context = ["No search results available."]
         else:
-            search_context = format_search_query_results(
+            search_context = iter_search_query_results(
                 search_docs,
                 include_raw_content=False
             )
 
-        # Generate sections
-        system_instructions_sections = REPORT_PLAN_SECTION_GENERATOR_PROMPT.format(
+        # Generate sections, streaming the search context straight into the prompt
+        system_instructions_sections = build_prompt(
+            REPORT_PLAN_SECTION_GENERATOR_PROMPT,
+            search_context,
+            context_field="search_context",
             topic=topic,
-            report_organization=report_structure,
-            search_context=search_context
+            report_organization=report_structure
         )
 
-        structured_llm = llm.with_structured_output(Sections)
-        report_sections = structured_llm.invoke([
+        plan = asyncio.ensure_future(ainvoke_llm(get_llm("generate_report_plan"), [
             SystemMessage(content=system_instructions_sections),
             HumanMessage(content="Generate the sections of the report. Your response must include a 'sections' field containing a list of sections. Each section must have: name, description, plan, research, and content fields.")
-        ])
+        ], schema=Sections))
+
+        # Research the probable sections while the plan is being written
+        if SPECULATIVE_RESEARCH == "on" and search_docs:
+            start_speculative_research(query_list, search_docs)
+        report_sections = await plan
+        if SPECULATIVE_RESEARCH == "on":
+            resolve_speculative_research(report_sections.sections)
+        run.manifest.set_plan(report_sections.sections)
+        plan_token_budget(report_sections.sections)
 
         print('--- Generating Report Plan Completed ---')
         return {"sections": report_sections.sections}
 
     except Exception as e:
         print(f"Error in generate_report_plan: {e}")
+        run.speculation.cancel()
         return {"sections": []}
@@ -2,36 +2,240 @@
 Main runner for the deep research agent.
 """
 import asyncio
-from IPython.display import display
-from rich.markdown import Markdown as RichMarkdown
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, Optional
 
 from src.workflows.main_workflow import create_main_workflow
+from src.agents.report_planner import plan_token_budget
+from src.models.schemas import Queries, ReportQueries, SearchQuery, Section, SectionQueries, Sections
+from src.utils.http import get_http_pool_stats
+from src.utils.llm import get_llm_cache, model_usage_report, print_model_usage
+from src.utils.search import get_passage_index, get_search_cache
+from src.utils.manifest import Regeneration, RunManifest, manifest_path
+from src.utils.run_context import RunContext, run_context
+from src.utils.token_budget import TokenBudget
 
 
-async def call_planner_agent(agent, prompt, config={"recursion_limit": 50}, verbose=False):
-    """Call the planner agent with the given prompt."""
+# SQLite file holding the checkpoints of runs started with a thread id
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
+
+# Types of graph state the checkpointer may deserialize when a run resumes; LangGraph blocks
+# unregistered types under LANGGRAPH_STRICT_MSGPACK (and by default in future versions)
+CHECKPOINT_TYPES = (Section, Sections, SearchQuery, Queries, SectionQueries, ReportQueries)
+
+# When set, the spans recorded during a run are written to this JSON file
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH")
+
+# "on" saves the run manifest (plan, queries, fingerprints and contents of the sections) next to the
+# report, e.g. outputs/final_output.manifest.json, for regenerate_research_agent; "off" does not
+RUN_MANIFEST = os.getenv("RUN_MANIFEST", "on")
+
+
+@asynccontextmanager
+async def open_checkpointer(thread_id: Optional[str]):
+    """
+    Open the durable SQLite checkpointer when a thread id is given, otherwise yield None.
+    Checkpoints deserialize the report schemas of CHECKPOINT_TYPES besides LangGraph's own types.
+    """
+    if thread_id is None:
+        yield None
+        return
+
+    import aiosqlite
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    directory = os.path.dirname(CHECKPOINT_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    async with aiosqlite.connect(CHECKPOINT_PATH) as conn:
+        yield AsyncSqliteSaver(conn, serde=JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES))
+
+
+def display_markdown(text: str) -> None:
+    """Render markdown in the notebook or terminal. IPython and rich are only imported when something is shown."""
+    from IPython.display import display
+    from rich.markdown import Markdown as RichMarkdown
+
+    display(RichMarkdown(text))
+
+
+def collect_run_stats(run: RunContext) -> Dict[str, Any]:
+    """Statistics of a finished run: its run context summary and the shared caches, pool and models."""
+    stats = run.summary()
+    stats["search_cache"] = get_search_cache().stats()
+    stats["http_pool"] = get_http_pool_stats()
+    stats["llm_cache"] = get_llm_cache().stats()
+    stats["llm_usage"] = model_usage_report(run.metrics.spans)
+    stats["passage_index"] = get_passage_index().stats()
+    return stats
+
+
+async def call_planner_agent(
+    agent,
+    prompt,
+    config={"recursion_limit": 50},
+    verbose=False,
+    output_path="outputs/final_output.md",
+    show_report=True
+):
+    """
+    Call the planner agent with the given prompt.
+    A prompt of None resumes the thread given in config from its last checkpoint.
+    """
     events = agent.astream(
-        {'topic': prompt},
+        {'topic': prompt} if prompt is not None else None,
         config,
         stream_mode="values",
     )
 
+    final_report = None
     async for event in events:
         for k, v in event.items():
             if verbose:
                 if k != "__end__":
-                    display(RichMarkdown(repr(k) + ' -> ' + repr(v)))
+                    display_markdown(repr(k) + ' -> ' + repr(v))
             if k == 'final_report':
-                print('='*50)
-                print('Final Report:')
-                md = RichMarkdown(v)
-                with open("outputs/final_output.md", "w", encoding="utf-8") as f:
+                with open(output_path, "w", encoding="utf-8") as f:
                     f.write(v)
-                display(md)
+                if show_report:
+                    print('='*50)
+                    print('Final Report:')
+                    display_markdown(v)
+                final_report = v
+
+    return final_report
+
+
+async def _run(
+    topic: Optional[str],
+    verbose: bool,
+    thread_id: Optional[str],
+    agent=None,
+    output_path: str = "outputs/final_output.md",
+    show_report: bool = True,
+    regeneration: Optional[Regeneration] = None,
+    budget: Optional[TokenBudget] = None
+):
+    """
+    Run or resume the workflow and collect the run statistics.
+    A pre-compiled `agent` can be passed in to share one compiled graph between runs.
+    With `regeneration`, the run reuses the plan and unchanged sections of a previous run.
+    `budget` caps the run's tokens and duration (default: TokenBudget.from_env()).
+    """
+    config = {"recursion_limit": 50}
+    if thread_id is not None:
+        config["configurable"] = {"thread_id": thread_id}
+
+    async with open_checkpointer(thread_id) as checkpointer:
+        reporter_agent = agent or create_main_workflow(checkpointer=checkpointer)
+
+        if topic is None:
+            snapshot = await reporter_agent.aget_state(config)
+            if not snapshot.values:
+                raise ValueError(f"No checkpoint found for thread '{thread_id}'")
+            if not snapshot.next:
+                # The run already finished, return the stored report
+                return {"final_report": snapshot.values.get("final_report"), "stats": {}}
+
+        with run_context(RunContext(regeneration=regeneration, budget=budget or TokenBudget.from_env())) as run:
+            run.budget.start()
+            if topic is None:
+                # Sections written before the interruption do not run again, so final sections
+                # scheduled eagerly must not wait for them
+                for task in snapshot.tasks:
+                    result = task.result or {}
+                    digests = result.get("section_digests", {})
+                    for section in result.get("completed_sections", []):
+                        run.sections.complete(section, digests.get(section.name))
+                # The plan is not generated again, but the budget is still shared out over its sections
+                plan_token_budget([
+                    s for s in snapshot.values.get("sections", []) if s.name not in run.sections.completed
+                ])
+            try:
+                final_report = await call_planner_agent(
+                    agent=reporter_agent,
+                    prompt=topic,
+                    config=config,
+                    verbose=verbose,
+                    output_path=output_path,
+                    show_report=show_report
+                )
+            except Exception:
+                if thread_id is not None:
+                    print(f"Run failed, continue it with resume_research_agent(thread_id='{thread_id}')")
+                raise
+
+    stats = collect_run_stats(run)
+    if METRICS_EXPORT_PATH:
+        run.metrics.export_json(METRICS_EXPORT_PATH)
+    if RUN_MANIFEST == "on" and final_report is not None:
+        # Resumed runs only know the sections written after the interruption, and sections the token
+        # budget refused are not recorded
+        if run.manifest.is_complete():
+            run.manifest.save(manifest_path(output_path))
+        else:
+            print("Run manifest not saved: not every section was written in this run")
+    if show_report:
+        run.metrics.print_summary()
+        print_model_usage(stats["llm_usage"])
+        print(f"Search cache: {stats['search_cache']}")
+        print(f"Passage index: {stats['passage_index']}")
+        print(f"LLM cache: {stats['llm_cache']}")
+        print(f"HTTP pool: {stats['http_pool']}")
+        print(f"Documents: {stats['documents']}")
+        print(f"Retries: {stats['retries']}")
+        print(f"Queries: {stats['queries']['requested']} requested, {stats['queries']['searched']} searched, "
+              f"{stats['queries']['saved']} answered by an equivalent query")
+        if regeneration is not None:
+            print(f"Regeneration: {stats['regeneration']}")
+        if run.budget.limited:
+            budget_stats = {key: value for key, value in stats["budget"].items() if key != "sections"}
+            print(f"Token budget: {budget_stats}")
+    return {"final_report": final_report, "stats": stats}
+
+
+async def run_research_agent(
+    topic: str,
+    verbose: bool = False,
+    thread_id: Optional[str] = None,
+    budget: Optional[TokenBudget] = None
+):
+    """
+    Run the deep research agent for the given topic.
+    When a thread_id is given, progress is checkpointed to CHECKPOINT_PATH so a failed run can be
+    continued with resume_research_agent.
+    A `budget` (e.g. TokenBudget(max_input_tokens=200_000, deadline_s=300)) caps the run's tokens and
+    duration; sections get smaller contexts as it drains and placeholders once it is spent.
+    Returns the final report and the statistics collected during the run.
+    """
+    return await _run(topic, verbose, thread_id, budget=budget)
+
+
+async def resume_research_agent(thread_id: str, verbose: bool = False):
+    """
+    Continue a checkpointed run from its last completed step.
+    Sections that were already completed are kept and not written again.
+    """
+    return await _run(None, verbose, thread_id)
 
 
-async def run_research_agent(topic: str, verbose: bool = False):
-    """Run the deep research agent for the given topic."""
-    reporter_agent = create_main_workflow()
-    result = await call_planner_agent(agent=reporter_agent, prompt=topic, verbose=verbose)
-    return result
+async def regenerate_research_agent(
+    manifest: str,
+    edits: Optional[Dict[str, str]] = None,
+    refresh: Iterable[str] = (),
+    verbose: bool = False,
+    output_path: str = "outputs/final_output.md"
+):
+    """
+    Regenerate the report of a previous run from its manifest, writing only the sections whose inputs changed.
+    `edits` gives sections new descriptions by name, `refresh` names sections to write again regardless.
+    Unchanged sections are searched again with their previous queries and keep their content when the
+    formatted sources are the same, which the search cache (SEARCH_CACHE_MODE) keeps stable within its TTL;
+    final sections are written again when a research section they use was. The new manifest replaces the
+    old one when output_path is the report it belongs to.
+    """
+    previous = RunManifest.load(manifest)
+    regeneration = Regeneration(previous, edits=edits, refresh=refresh)
+    return await _run(previous.topic, verbose, None, output_path=output_path, regeneration=regeneration)
@@ -1,75 +1,178 @@
 """
 Section building agent functions for individual report sections.
 """
-from langchain_openai import ChatOpenAI
+import os
+
+from typing import Dict, List, Optional
+
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 
 from src.models.schemas import SectionState, Queries, SearchQuery
-from src.utils.search import run_search_queries
+from src.utils.search import run_adaptive_search_queries
 from src.utils.formatters import format_search_query_results
+from src.utils.context_packing import format_packed_search_results
+from src.utils.llm import ainvoke_llm, get_llm, model_for_node
+from src.utils.manifest import fingerprint
+from src.utils.run_context import get_run_context
+from src.utils.token_budget import unwritten_section
 from src.agents.prompts import (
     REPORT_SECTION_QUERY_GENERATOR_PROMPT,
     SECTION_WRITER_PROMPT
 )
 
 
-llm = ChatOpenAI(model_name="gpt-4o", temperature=0)
+# Token budget for the whole search context of one section, across all of its sources
+SECTION_CONTEXT_MAX_TOKENS = int(os.getenv("SECTION_CONTEXT_MAX_TOKENS", "32000"))
 
+# How the search context of a section is built: "full" gives every source in arrival order,
+# "ranked" gives the passages most relevant to the section (BM25) within RANKED_CONTEXT_TOKENS
+SECTION_CONTEXT_MODE = os.getenv("SECTION_CONTEXT_MODE", "full")
+RANKED_CONTEXT_TOKENS = int(os.getenv("RANKED_CONTEXT_TOKENS", "8000"))
+CONTEXT_PASSAGE_TOKENS = int(os.getenv("CONTEXT_PASSAGE_TOKENS", "200"))
+# Raw-content cap per source, lowered by the run's token budget as it drains
+SOURCE_MAX_TOKENS = 4000
 
-def generate_queries(state: SectionState):
-    """Generate search queries for a specific report section"""
-    # Get state
-    section = state["section"]
-    print('--- Generating Search Queries for Section: '+ section.name +' ---')
 
-    # Get configuration
-    number_of_queries = 5
+def section_context_tokens() -> int:
+    """Token size of a research section's search context without a token budget."""
+    return RANKED_CONTEXT_TOKENS if SECTION_CONTEXT_MODE == "ranked" else SECTION_CONTEXT_MAX_TOKENS
 
-    # Generate queries
-    structured_llm = llm.with_structured_output(Queries)
+
+async def generate_section_queries(
+    topic: str,
+    config: Optional[RunnableConfig] = None,
+    cache: bool = True
+) -> List[SearchQuery]:
+    """Generate the search queries for a section topic."""
+    number_of_queries = 5
 
     # Format system instructions
     system_instructions = REPORT_SECTION_QUERY_GENERATOR_PROMPT.format(
-        section_topic=section.description,
+        section_topic=topic,
         number_of_queries=number_of_queries
     )
 
     # Generate queries
     user_instruction = "Generate search queries on the provided topic."
-    search_queries = structured_llm.invoke([
+    search_queries = await ainvoke_llm(get_llm("generate_queries"), [
         SystemMessage(content=system_instructions),
         HumanMessage(content=user_instruction)
-    ])
+    ], config=config, schema=Queries, cache=cache)
+    return search_queries.queries
+
+
+async def search_section_sources(search_queries: List[SearchQuery], label: str) -> List[Dict]:
+    """Search the web for each query of a section."""
+    query_list = [query.search_query for query in search_queries]
+    return await run_adaptive_search_queries(
+        query_list, num_results=6, include_raw_content=True, label=label
+    )
+
 
+async def generate_queries(state: SectionState):
+    """Generate search queries for a specific report section"""
+    # Get state
+    section = state["section"]
+
+    run = get_run_context()
+
+    # Queries researched speculatively while the plan was generated
+    speculative = await run.speculation.take(section.name)
+    if speculative is not None:
+        print('--- Using Speculative Search Queries for Section: '+ section.name +' ---')
+        return {"search_queries": speculative[0]}
+
+    # Incremental runs keep the queries of sections whose description did not change
+    regeneration = run.regeneration
+    if regeneration is not None and regeneration.queries(section) is not None:
+        print('--- Reusing Search Queries for Section: '+ section.name +' ---')
+        return {"search_queries": regeneration.queries(section)}
+
+    print('--- Generating Search Queries for Section: '+ section.name +' ---')
+    search_queries = await generate_section_queries(
+        section.description, cache=regeneration is None or regeneration.use_cache(section)
+    )
     print('--- Generating Search Queries for Section: '+ section.name +' Completed ---')
 
-    return {"search_queries": search_queries.queries}
+    return {"search_queries": search_queries}
 
 
 async def search_web(state: SectionState):
     """Search the web for each query, then return a list of raw sources and a formatted string of sources."""
     # Get state
+    section = state["section"]
     search_queries = state["search_queries"]
 
-    print('--- Searching Web for Queries ---')
+    run = get_run_context()
 
-    # Web search
-    query_list = [query.search_query for query in search_queries]
-    search_docs = await run_search_queries(search_queries, num_results=6, include_raw_content=True)
+    # The section's share of the run's token budget: no search when it cannot be written
+    allocation = run.budget.allocate(section.name, section_context_tokens(), SOURCE_MAX_TOKENS)
+    if allocation.refused:
+        print('--- Skipping Web Search for Section: '+ section.name +' ('+ allocation.refused +') ---')
+        return {"source_str": ""}
 
-    # Deduplicate and format sources
-    search_context = format_search_query_results(search_docs, max_tokens=4000, include_raw_content=True)
+    print('--- Searching Web for Queries ---')
+
+    # Web search, unless it already ran speculatively with these queries
+    speculative = await run.speculation.take(section.name)
+    if speculative is not None and speculative[0] == search_queries:
+        search_docs = speculative[1]
+    else:
+        search_docs = await search_section_sources(search_queries, label=section.name)
+
+    # Deduplicate and format sources within the allocated context (snippets only when it is small)
+    if SECTION_CONTEXT_MODE == "ranked" and allocation.raw_content:
+        search_context = format_packed_search_results(
+            search_docs,
+            query=f"{section.name} {section.description}",
+            max_total_tokens=allocation.context_tokens,
+            max_tokens_per_source=allocation.source_tokens,
+            passage_tokens=CONTEXT_PASSAGE_TOKENS
+        )
+    else:
+        search_context = format_search_query_results(
+            search_docs,
+            max_tokens=allocation.source_tokens,
+            include_raw_content=allocation.raw_content,
+            max_total_tokens=allocation.context_tokens
+        )
 
     print('--- Searching Web for Queries Completed ---')
 
     return {"source_str": search_context}
 
 
-def write_section(state: SectionState):
+async def write_section(state: SectionState):
     """Write a section of the report"""
     # Get state
     section = state["section"]
     source_str = state["source_str"]
+    run = get_run_context()
+    allocation = run.budget.allocation(section.name)
+
+    # Incremental runs keep the previous content when the section's inputs did not change
+    section_fingerprint = fingerprint(
+        section.name, section.description, [query.search_query for query in state["search_queries"]],
+        source_str, SECTION_WRITER_PROMPT, model_for_node("write_section"),
+        allocation.fingerprint_part() if allocation is not None else None
+    )
+    regeneration = run.regeneration
+    if regeneration is not None:
+        content = regeneration.reuse(section, section_fingerprint)
+        if content is not None:
+            print('--- Reusing Section : '+ section.name +' ---')
+            section.content = content
+            run.manifest.record(section, section_fingerprint, content, queries=state["search_queries"])
+            run.budget.settle(section.name)
+            return {"completed_sections": [section]}
+
+    # Sections the token budget or deadline did not leave room for get a placeholder, which is not
+    # recorded in the manifest so a later run writes them
+    if allocation is not None and allocation.refused:
+        print('--- Not Writing Section : '+ section.name +' ('+ allocation.refused +') ---')
+        section.content = unwritten_section(section.name, allocation.refused)
+        return {"completed_sections": [section]}
 
     print('--- Writing Section : '+ section.name +' ---')
 
@@ -82,13 +185,17 @@ def write_section(state: SectionState):
 
     # Generate section
     user_instruction = "Generate a report section based on the provided sources."
-    section_content = llm.invoke([
+    use_cache = regeneration is None or regeneration.use_cache(section)
+    section_content = await ainvoke_llm(get_llm("write_section"), [
         SystemMessage(content=system_instructions),
         HumanMessage(content=user_instruction)
-    ])
+    ], config={"metadata": {"section_name": section.name}}, cache=use_cache,
+        max_tokens=allocation.max_output_tokens if allocation is not None else None)
+    run.budget.settle(section.name)
 
     # Write content to the section object
     section.content = section_content.content
+    run.manifest.record(section, section_fingerprint, section.content, queries=state["search_queries"])
 
     print('--- Writing Section : '+ section.name +' Completed ---')
 
@@ -0,0 +1,116 @@
+"""
+Section digests: bounded-size summaries of written research sections, used as context for the
+final sections instead of the full text of every section.
+"""
+import asyncio
+import os
+import re
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.models.schemas import Section, SectionState
+from src.agents.prompts import SECTION_DIGEST_PROMPT
+from src.utils.cache import DiskCache, make_cache_key
+from src.utils.llm import ainvoke_llm, get_llm, model_for_node
+from src.utils.metrics import trace
+from src.utils.run_context import get_run_context
+from src.utils.tokens import count_tokens, truncate_to_tokens
+
+
+# How digests are made: "llm" (summarized by the model), "extractive" (headings, first sentences
+# and list items of the section, no LLM call) or "off" (final sections get the full sections)
+SECTION_DIGEST_MODE = os.getenv("SECTION_DIGEST_MODE", "extractive")
+# Token size of one section digest
+SECTION_DIGEST_TOKENS = int(os.getenv("SECTION_DIGEST_TOKENS", "400"))
+# Token budget for all the digests given to one final section
+FINAL_SECTION_CONTEXT_TOKENS = int(os.getenv("FINAL_SECTION_CONTEXT_TOKENS", "4000"))
+SECTION_DIGEST_CACHE_PATH = os.getenv("SECTION_DIGEST_CACHE_PATH", ".cache/section_digests.sqlite")
+SECTION_DIGEST_CACHE_TTL_SECONDS = float(os.getenv("SECTION_DIGEST_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+SECTION_DIGEST_CACHE_MAX_MB = float(os.getenv("SECTION_DIGEST_CACHE_MAX_MB", "64"))
+
+# Initialize the digest cache lazily so importing the module does not touch the disk
+digest_cache = None
+
+
+def get_digest_cache() -> DiskCache:
+    """Get the on-disk digest cache, initializing it if needed."""
+    global digest_cache
+    if digest_cache is None:
+        digest_cache = DiskCache(
+            SECTION_DIGEST_CACHE_PATH,
+            namespace="section_digests",
+            ttl_seconds=SECTION_DIGEST_CACHE_TTL_SECONDS,
+            max_bytes=int(SECTION_DIGEST_CACHE_MAX_MB * 1024 * 1024)
+        )
+    return digest_cache
+
+
+def extractive_digest(content: str, max_tokens: int) -> str:
+    """
+    Digest a markdown section without an LLM: keep headings, the first sentence of every paragraph
+    and list and table rows, and drop the sources list.
+    """
+    lines = []
+    for block in re.split(r"\n\s*\n", content):
+        block = block.strip()
+        if not block:
+            continue
+        first_line = block.splitlines()[0]
+        if first_line.lstrip("#").strip().lower() in ("sources", "references"):
+            break
+        if first_line.startswith("#"):
+            lines.append(first_line)
+        elif first_line.lstrip().startswith(("-", "*", "|")) or re.match(r"\s*\d+\.", first_line):
+            lines.extend(line.rstrip() for line in block.splitlines())
+        else:
+            paragraph = " ".join(block.split())
+            lines.append(re.split(r"(?<=[.!?])\s", paragraph, maxsplit=1)[0])
+    return truncate_to_tokens("\n".join(lines), max_tokens)[0]
+
+
+async def make_digest(section: Section) -> str:
+    """
+    Digest of a written section, served from the cache when the same content was digested before
+    with the same settings, prompt and model.
+    """
+    key = make_cache_key(
+        SECTION_DIGEST_MODE, SECTION_DIGEST_TOKENS, SECTION_DIGEST_PROMPT, model_for_node("digest_section"),
+        section.name, section.content
+    )
+    with trace("digest_section", "digest", section=section.name) as span:
+        digest = await asyncio.to_thread(get_digest_cache().get, key)
+        span.attributes["cached"] = digest is not None
+        if digest is None:
+            if SECTION_DIGEST_MODE == "llm":
+                system_instructions = SECTION_DIGEST_PROMPT.format(
+                    section_title=section.name,
+                    section_content=section.content,
+                    # About 0.75 words per token
+                    max_words=SECTION_DIGEST_TOKENS * 3 // 4
+                )
+                # Digests have their own cache keyed by section content
+                response = await ainvoke_llm(get_llm("digest_section"), [
+                    SystemMessage(content=system_instructions),
+                    HumanMessage(content="Write the digest of the section.")
+                ], cache=False)
+                digest = truncate_to_tokens(response.content, SECTION_DIGEST_TOKENS)[0]
+            else:
+                digest = extractive_digest(section.content, SECTION_DIGEST_TOKENS)
+            await asyncio.to_thread(get_digest_cache().set, key, digest)
+        span.attributes["section_tokens"] = count_tokens(section.content)
+        span.attributes["digest_tokens"] = count_tokens(digest)
+    return digest
+
+
+async def digest_section(state: SectionState):
+    """Digest a written section so the final sections can use it as compact context."""
+    section = state["completed_sections"][0]
+    digest = None
+    if SECTION_DIGEST_MODE != "off":
+        print('--- Digesting Section : '+ section.name +' ---')
+        digest = await make_digest(section)
+
+    # Let final sections waiting on this one start (eager scheduling)
+    get_run_context().sections.complete(section, digest)
+
+    return {"section_digests": {section.name: digest} if digest is not None else {}}
@@ -0,0 +1,96 @@
+"""
+Speculative section research, run while the report plan's Sections call is in flight.
+
+The planner's search queries are good guesses at the report's sub-topics. In speculative mode
+each distinct query whose search returned results becomes a candidate section: its section
+queries are generated and searched right away, and when the plan arrives the candidates that
+match a research section hand it their queries and results. The rest are cancelled.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+
+from src.agents.section_builder import generate_section_queries, search_section_sources
+from src.models.schemas import Section
+from src.utils.metrics import trace
+from src.utils.query_registry import QUERY_DEDUP_THRESHOLD, jaccard, query_terms
+from src.utils.run_context import get_run_context
+from src.utils.speculation import Candidate
+
+
+# "on" starts research for probable sections while the plan is being generated, "off" waits for the plan
+SPECULATIVE_RESEARCH = os.getenv("SPECULATIVE_RESEARCH", "off")
+# Maximum number of probable sections researched speculatively
+SPECULATIVE_MAX_SECTIONS = int(os.getenv("SPECULATIVE_MAX_SECTIONS", "5"))
+# Share of a candidate's terms a research section's name and description must contain to take over its research
+SPECULATIVE_MATCH_THRESHOLD = float(os.getenv("SPECULATIVE_MATCH_THRESHOLD", "0.5"))
+
+
+def probable_sections(query_list: List[str], search_docs: List[Dict], limit: int) -> List[str]:
+    """Planner queries that returned results, skipping near-duplicates of queries already picked."""
+    answered = {
+        response.get("query") for response in search_docs
+        if isinstance(response, dict) and response.get("results")
+    }
+    picked: List[str] = []
+    for query in query_list:
+        terms = query_terms(query)
+        if query not in answered or not terms:
+            continue
+        if any(jaccard(terms, query_terms(other)) >= QUERY_DEDUP_THRESHOLD for other in picked):
+            continue
+        picked.append(query)
+        if len(picked) == limit:
+            break
+    return picked
+
+
+async def research_candidate(candidate: Candidate):
+    """Generate the section queries of a candidate and search them, accounting for the tokens and searches spent."""
+    usage = UsageMetadataCallbackHandler()
+    label = f"speculative: {candidate.topic}"
+    try:
+        with trace("speculative_research", "speculation", topic=candidate.topic):
+            search_queries = await generate_section_queries(candidate.topic, config={"callbacks": [usage]})
+            search_docs = await search_section_sources(search_queries, label=label)
+        escalated = get_run_context().search_decisions.get(label, {}).get("escalated")
+        candidate.searches = len(search_queries) * (2 if escalated else 1)
+        return search_queries, search_docs
+    finally:
+        candidate.finished = time.perf_counter()
+        for tokens in usage.usage_metadata.values():
+            candidate.input_tokens += tokens.get("input_tokens", 0)
+            candidate.output_tokens += tokens.get("output_tokens", 0)
+        claim_search_decision(candidate)
+
+
+def claim_search_decision(candidate: Candidate) -> None:
+    """Record a kept candidate's adaptive search decision under its section."""
+    decisions = get_run_context().search_decisions
+    label = f"speculative: {candidate.topic}"
+    if candidate.section is not None and label in decisions:
+        decisions[candidate.section] = decisions.pop(label)
+
+
+def start_speculative_research(query_list: List[str], search_docs: List[Dict]) -> None:
+    """Start researching the probable sections in the background of the current node."""
+    speculation = get_run_context().speculation
+    for topic in probable_sections(query_list, search_docs, SPECULATIVE_MAX_SECTIONS):
+        candidate = speculation.add(topic)
+        candidate.task = asyncio.ensure_future(research_candidate(candidate))
+        # Errors of candidates nobody takes over should not be reported as unretrieved
+        candidate.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    print(f'--- Researching {len(speculation.candidates)} Probable Sections Speculatively ---')
+
+
+def resolve_speculative_research(sections: List[Section]) -> None:
+    """Hand the speculative research to the matching sections of the plan and cancel the rest."""
+    speculation = get_run_context().speculation
+    speculation.resolve(sections, SPECULATIVE_MATCH_THRESHOLD)
+    for candidate in speculation.kept.values():
+        claim_search_decision(candidate)
+    print(f'--- Speculative Research: {len(speculation.kept)} of {len(speculation.candidates)} '
+          f'Probable Sections Kept ---')
@@ -0,0 +1,114 @@
+"""
+Streaming interface: yields plan, token and section events while the report is being written.
+"""
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.models.schemas import Section
+from src.workflows.main_workflow import create_main_workflow
+from src.agents.runner import collect_run_stats, open_checkpointer
+from src.utils.run_context import RunContext, run_context
+from src.utils.token_budget import TokenBudget
+
+
+# Nodes whose LLM output is the text of a report section
+SECTION_WRITER_NODES = ("write_section", "write_final_sections")
+
+
+class ReportDraft:
+    """
+    Partial report assembled from streamed events.
+    Sections appear in plan order; finished sections show their content, sections being written
+    show the tokens received so far and the rest show a placeholder.
+    """
+
+    def __init__(self):
+        self.sections: List[Section] = []
+        self.drafts: Dict[str, str] = {}
+        self.completed: Dict[str, str] = {}
+
+    def apply(self, event: Dict[str, Any]) -> None:
+        """Update the draft with one event from stream_research_agent."""
+        if event["type"] == "plan_ready":
+            self.sections = event["sections"]
+        elif event["type"] == "token":
+            self.drafts[event["section"]] = self.drafts.get(event["section"], "") + event["delta"]
+        elif event["type"] == "section_complete":
+            self.completed[event["section"].name] = event["section"].content
+
+    def render(self) -> str:
+        """Render the report as far as it has been written."""
+        parts = []
+        for section in self.sections:
+            if section.name in self.completed:
+                parts.append(self.completed[section.name])
+            elif section.name in self.drafts:
+                parts.append(self.drafts[section.name] + " ...")
+            else:
+                parts.append(f"## {section.name}\n\n[Writing...]")
+        return "\n\n".join(parts)
+
+
+async def stream_research_agent(
+    topic: str,
+    thread_id: Optional[str] = None,
+    config: Optional[Dict[str, Any]] = None,
+    budget: Optional[TokenBudget] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the deep research agent and yield events as the report is produced:
+
+    - {"type": "plan_ready", "sections": [...]} once the report plan exists
+    - {"type": "token", "section": name, "node": node, "delta": text} for every token of a section draft
+    - {"type": "section_complete", "section": Section} when a section is written
+    - {"type": "final_report", "report": text, "stats": {...}} at the end
+
+    Every event carries "elapsed_s", the seconds since the run started.
+    `budget` caps the run's tokens and duration like in run_research_agent (default: TokenBudget.from_env()).
+    Feed the events to a ReportDraft to render a partial report while sections are still being written.
+    """
+    start = time.perf_counter()
+    config = dict(config or {"recursion_limit": 50})
+    if thread_id is not None:
+        config["configurable"] = {"thread_id": thread_id}
+
+    def event(**fields: Any) -> Dict[str, Any]:
+        fields["elapsed_s"] = round(time.perf_counter() - start, 3)
+        return fields
+
+    async with open_checkpointer(thread_id) as checkpointer:
+        reporter_agent = create_main_workflow(checkpointer=checkpointer)
+        completed = set()
+        final_report = None
+
+        with run_context(RunContext(budget=budget or TokenBudget.from_env())) as run:
+            run.budget.start()
+            stream = reporter_agent.astream(
+                {"topic": topic},
+                config,
+                stream_mode=["updates", "messages"],
+                subgraphs=True,
+            )
+            async for namespace, mode, chunk in stream:
+                if mode == "messages":
+                    message, metadata = chunk
+                    node = metadata.get("langgraph_node")
+                    if node in SECTION_WRITER_NODES and message.content:
+                        yield event(type="token", section=metadata.get("section_name"), node=node,
+                                    delta=message.content)
+                    continue
+
+                for node, update in chunk.items():
+                    if not update:
+                        continue
+                    if node == "generate_report_plan" and not namespace:
+                        yield event(type="plan_ready", sections=update.get("sections", []))
+                    elif node in SECTION_WRITER_NODES:
+                        for section in update.get("completed_sections", []):
+                            if section.name not in completed:
+                                completed.add(section.name)
+                                yield event(type="section_complete", section=section)
+                    elif node == "compile_final_report":
+                        final_report = update.get("final_report")
+
+    yield event(type="final_report", report=final_report, stats=collect_run_stats(run))
@@ -22,6 +22,10 @@ class Section(BaseModel):
     content: str = Field(
         description="The content for this section."
     )
+    depends_on: List[str] = Field(
+        default_factory=list,
+        description="For sections without research, the names of the research sections whose content is needed to write it. Empty means all of them.",
+    )
 
 
 class Sections(BaseModel):
@@ -43,6 +47,23 @@ class Queries(BaseModel):
     )
 
 
+class SectionQueries(BaseModel):
+    """Search queries planned for one section of the report."""
+    section_name: str = Field(
+        description="Name of the section, exactly as given.",
+    )
+    queries: List[SearchQuery] = Field(
+        description="List of web search queries for this section.",
+    )
+
+
+class ReportQueries(BaseModel):
+    """Container for the search queries of several report sections."""
+    sections: List[SectionQueries] = Field(
+        description="The search queries of each section.",
+    )
+
+
 class ReportStateInput(TypedDict):
     """Input state for the report generation workflow."""
     topic: str  # Report topic
@@ -58,6 +79,8 @@ class ReportState(TypedDict):
     topic: str  # Report topic
     sections: list[Section]  # List of report sections
     completed_sections: Annotated[list, operator.add]  # Send() API
+    section_digests: Annotated[dict, operator.or_]  # Digest of each research section, by section name
+    section_queries: dict[str, list[SearchQuery]]  # Search queries planned in advance, by section name
     report_sections_from_research: str  # String of any completed sections from research to write final sections
     final_report: str  # Final report
 
@@ -68,9 +91,12 @@ class SectionState(TypedDict):
     search_queries: list[SearchQuery]  # List of search queries
     source_str: str  # String of formatted source content from web search
     report_sections_from_research: str  # String of any completed sections from research to write final sections
+    depends_on: list[str]  # Research sections a final section waits for when scheduled eagerly
     completed_sections: list[Section]  # Final key we duplicate in outer state for Send() API
+    section_digests: dict[str, str]  # Digest of the written section, duplicated in outer state
 
 
 class SectionOutputState(TypedDict):
     """Output state for section processing."""
     completed_sections: list[Section]  # Final key we duplicate in outer state for Send() API
+    section_digests: dict[str, str]  # Digest of the written section, duplicated in outer state
@@ -0,0 +1,186 @@
+"""
+Relevance-ranked context packing for the section writer.
+
+Instead of concatenating every source in arrival order, the raw content of each source is split
+into passages, the passages are scored against the section with BM25, and the best ones fill a
+fixed token budget. Selected passages are grouped under their source's title and URL so the
+writer can still cite them.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterator, List, Union
+
+from src.utils.formatters import collect_sources
+from src.utils.metrics import trace
+from src.utils.query_registry import tokenize
+from src.utils.run_context import get_run_context
+from src.utils.tokens import count_tokens, truncate_batch
+
+
+@dataclass
+class Passage:
+    """A chunk of one source's content."""
+    url: str
+    position: int
+    text: str
+    tokens: int
+    terms: List[str]
+    score: float = 0.0
+
+
+class BM25:
+    """Okapi BM25 over a fixed set of tokenized documents."""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+
+    def scores(self, query: List[str]) -> List[float]:
+        """Score of every document for the query."""
+        terms = set(query)
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            scores.append(sum(
+                self.idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                for term in terms if term in counts
+            ))
+        return scores
+
+
+def split_passages(url: str, text: str, tokens: int, passage_tokens: int) -> List[Passage]:
+    """
+    Split a source's text into passages of about passage_tokens tokens along paragraph boundaries.
+    Token counts are estimated from the text's known total, which avoids encoding every passage.
+    """
+    chars_per_token = len(text) / tokens if tokens else 4.0
+    max_chars = int(passage_tokens * chars_per_token)
+    passages: List[Passage] = []
+    current: List[str] = []
+    current_chars = 0
+
+    def flush():
+        nonlocal current, current_chars
+        if current:
+            chunk = "\n\n".join(current)
+            passages.append(Passage(
+                url, len(passages), chunk, max(1, round(len(chunk) / chars_per_token)), tokenize(chunk)
+            ))
+        current, current_chars = [], 0
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        # Paragraphs longer than a passage are split on word boundaries
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            flush()
+            current, current_chars = [paragraph[:cut]], cut
+            flush()
+            paragraph = paragraph[cut:].strip()
+        if current_chars + len(paragraph) > max_chars:
+            flush()
+        current.append(paragraph)
+        current_chars += len(paragraph) + 2
+    flush()
+    return passages
+
+
+def iter_packed_search_results(
+    search_response: Union[Dict[str, Any], List[Any]],
+    query: str,
+    max_total_tokens: int,
+    max_tokens_per_source: int = 4000,
+    passage_tokens: int = 200
+) -> Iterator[str]:
+    """
+    Yield a context of the passages of the search results most relevant to `query`, within max_total_tokens.
+    Sources are deduplicated by URL and their raw content (or snippet when there is none) is first cut
+    to max_tokens_per_source, reusing the truncations of the run's document store.
+    """
+    document_store = get_run_context().document_store
+    sources: Dict[str, Dict[str, Any]] = {}
+    for source in collect_sources(search_response):
+        if isinstance(source, dict) and "url" in source and source["url"] not in sources:
+            sources[source["url"]] = source
+
+    if not sources:
+        yield "No search results found."
+        return
+
+    raw_sources = [(url, source["raw_content"]) for url, source in sources.items() if source.get("raw_content")]
+    truncated = document_store.truncated_raw_contents(raw_sources, max_tokens_per_source, truncate_batch)
+    texts = {url: result for (url, _), result in zip(raw_sources, truncated)}
+
+    # Passages of a page are split and tokenized once per run, other sections citing it reuse them
+    passages: List[Passage] = []
+    for url, source in sources.items():
+        document = document_store.get(url) if url in texts else None
+        key = (max_tokens_per_source, passage_tokens)
+        if document is not None and key in document.passages:
+            source_passages = document.passages[key]
+        else:
+            text, tokens = texts.get(url) or (source.get("content") or "", count_tokens(source.get("content") or ""))
+            source_passages = split_passages(url, text, tokens, passage_tokens)
+            if document is not None:
+                document.passages[key] = source_passages
+        # Copies, since scores differ between sections
+        passages.extend(replace(passage) for passage in source_passages)
+
+    header = "Most relevant passages from web search:\n\n"
+    yield header
+    if not passages:
+        return
+
+    for passage, score in zip(passages, BM25([p.terms for p in passages]).scores(tokenize(query))):
+        passage.score = score
+
+    # Fill the budget with the best passages; a source's title and URL count against it once
+    remaining = max_total_tokens - count_tokens(header)
+    selected: Dict[str, List[Passage]] = {}
+    for passage in sorted(passages, key=lambda p: p.score, reverse=True):
+        cost = passage.tokens
+        if passage.url not in selected:
+            cost += count_tokens(_source_header(sources[passage.url]))
+        if cost > remaining:
+            continue
+        remaining -= cost
+        selected.setdefault(passage.url, []).append(passage)
+
+    # Sources in order of their best passage, passages in document order
+    for url, chosen in selected.items():
+        yield _source_header(sources[url])
+        for passage in sorted(chosen, key=lambda p: p.position):
+            yield f"{passage.text}\n\n"
+
+
+def _source_header(source: Dict[str, Any]) -> str:
+    return f"Source {source.get('title', 'Untitled')}:\n===\nURL: {source['url']}\n===\nPassages:\n"
+
+
+def format_packed_search_results(
+    search_response: Union[Dict[str, Any], List[Any]],
+    query: str,
+    max_total_tokens: int,
+    max_tokens_per_source: int = 4000,
+    passage_tokens: int = 200
+) -> str:
+    """Format the passages of the search results most relevant to `query` within max_total_tokens."""
+    with trace("format_packed_search_results", "format") as span:
+        formatted = "".join(iter_packed_search_results(
+            search_response, query, max_total_tokens, max_tokens_per_source, passage_tokens
+        )).strip()
+        span.attributes["bytes"] = len(formatted.encode("utf-8"))
+    return formatted
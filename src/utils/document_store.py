@@ -0,0 +1,120 @@
+"""
+Per-run store of fetched web documents, shared by the planner and all section subgraphs.
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class Document:
+    """A fetched web page, stored once per URL."""
+    url: str
+    title: str = "Untitled"
+    content: str = ""
+    raw_content: Optional[str] = None
+    # Truncated raw content and its token count, keyed by the token cap used
+    truncations: Dict[int, Tuple[str, int]] = field(default_factory=dict)
+    # Ranked-context passages and their terms, keyed by (token cap, passage size)
+    passages: Dict[Tuple[int, int], List[Any]] = field(default_factory=dict)
+
+
+class DocumentStore:
+    """
+    URL-keyed store of search results for one run.
+    Search results are registered as they arrive so every section shares one copy of each page,
+    and truncated raw content is computed once per (URL, token cap).
+    """
+
+    def __init__(self):
+        self.documents: Dict[str, Document] = {}
+        self.fetches = 0
+        self.duplicate_fetches = 0
+        self.tokenizations = 0
+        self.tokenizations_avoided = 0
+        self._lock = threading.Lock()
+
+    def add_search_results(self, search_docs: List[Any]) -> None:
+        """
+        Register the results of run_search_queries.
+        Duplicate raw content in the responses is replaced by a reference to the stored copy.
+        """
+        with self._lock:
+            for response in search_docs:
+                results = response.get("results", []) if isinstance(response, dict) else []
+                for result in results:
+                    if isinstance(result, dict) and "url" in result:
+                        self._add_result(result)
+
+    def _add_result(self, result: Dict[str, Any]) -> None:
+        self.fetches += 1
+        url = result["url"]
+        document = self.documents.get(url)
+        if document is None:
+            self.documents[url] = Document(
+                url=url,
+                title=result.get("title", "Untitled"),
+                content=result.get("content", ""),
+                raw_content=result.get("raw_content") or None,
+            )
+            return
+
+        self.duplicate_fetches += 1
+        if document.raw_content is None and result.get("raw_content"):
+            # The planner searches without raw content, a later section search may bring it
+            document.raw_content = result["raw_content"]
+        elif document.raw_content is not None and "raw_content" in result:
+            result["raw_content"] = document.raw_content
+
+    def get(self, url: str) -> Optional[Document]:
+        """Return the stored document for url, if any."""
+        return self.documents.get(url)
+
+    def truncated_raw_contents(
+        self,
+        sources: List[Tuple[str, str]],
+        max_tokens: int,
+        truncate_batch: Callable[[List[str], int], List[Tuple[str, int]]]
+    ) -> List[Tuple[str, int]]:
+        """
+        Return the raw content of each (url, raw_content) pair cut to max_tokens, with its token count,
+        reusing earlier truncations of the same page. `truncate_batch` returns (text, token count) pairs
+        and is called once with all the pages that have not been truncated to this cap yet.
+        """
+        truncated: List[Optional[Tuple[str, int]]] = []
+        pending: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, (url, raw_content) in enumerate(sources):
+                document = self.documents.get(url)
+                if document is None:
+                    document = Document(url=url, raw_content=raw_content)
+                    self.documents[url] = document
+                cached = document.truncations.get(max_tokens)
+                if cached is not None:
+                    self.tokenizations_avoided += 1
+                    truncated.append(cached)
+                else:
+                    truncated.append(None)
+                    pending.setdefault(url, []).append(i)
+
+        if pending:
+            urls = list(pending)
+            texts = [self.documents[url].raw_content or sources[pending[url][0]][1] for url in urls]
+            results = truncate_batch(texts, max_tokens)
+            with self._lock:
+                for url, result in zip(urls, results):
+                    self.documents[url].truncations[max_tokens] = result
+                    self.tokenizations += 1
+                    for i in pending[url]:
+                        truncated[i] = result
+        return truncated
+
+    def stats(self) -> Dict[str, int]:
+        """Counters describing how much duplicate work the store avoided."""
+        return {
+            "documents": len(self.documents),
+            "fetched_results": self.fetches,
+            "duplicate_fetches": self.duplicate_fetches,
+            "tokenizations": self.tokenizations,
+            "tokenizations_avoided": self.tokenizations_avoided,
+        }
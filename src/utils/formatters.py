@@ -1,21 +1,24 @@
 """
 Formatting utilities for search results and report sections.
+
+Formatters are generators that yield the output in chunks, so callers can join them once
+or stream them straight into a prompt without building intermediate strings.
 """
-import tiktoken
-from typing import List, Dict, Union, Any
+from typing import Iterable, Iterator, List, Dict, Optional, Union, Any
 
+from src.utils.metrics import trace
+from src.utils.run_context import get_run_context
+from src.utils.tokens import count_tokens, truncate_batch, truncate_to_tokens
 
-def format_search_query_results(
-    search_response: Union[Dict[str, Any], List[Any]],
-    max_tokens: int = 2000,
-    include_raw_content: bool = False
-) -> str:
-    """
-    Extract the context from tavily search results,
-    make sure content is not duplicated from same urls and format it to show the Source, URL,
-    relevant content (and optionally raw content which can be truncated based on number of tokens)
-    """
-    encoding = tiktoken.encoding_for_model("gpt-4")
+
+# Tokens taken by the "Raw Content: ...\n\n" wrapper around a page's raw content
+RAW_CONTENT_LABEL_TOKENS = 6
+# Tokens kept in reserve for the note about sources left out of the budget
+OMITTED_NOTE_TOKENS = 16
+
+
+def collect_sources(search_response: Union[Dict[str, Any], List[Any]]) -> List[Any]:
+    """Flatten the different tavily response formats into one list of sources."""
     sources_list = []
 
     # Handle different response formats
@@ -36,8 +39,27 @@ def format_search_query_results(
             elif isinstance(response, list):
                 sources_list.extend(response)
 
+    return sources_list
+
+
+def iter_search_query_results(
+    search_response: Union[Dict[str, Any], List[Any]],
+    max_tokens: int = 2000,
+    include_raw_content: bool = False,
+    max_total_tokens: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Yield the formatted context of tavily search results chunk by chunk.
+    Sources are deduplicated by URL. Raw content is cut to max_tokens per source, and when
+    max_total_tokens is set the whole context stays within that budget: the raw content of the
+    source that crosses the budget is cut further and the remaining sources are left out.
+    """
+    document_store = get_run_context().document_store
+    sources_list = collect_sources(search_response)
+
     if not sources_list:
-        return "No search results found."
+        yield "No search results found."
+        return
 
     # Deduplicate by URL and keep unique sources (website urls)
     unique_sources = {}
@@ -46,30 +68,75 @@ def format_search_query_results(
             if source['url'] not in unique_sources:
                 unique_sources[source['url']] = source
 
-    # Format output
-    formatted_text = "Content from web search:\n\n"
-    for i, source in enumerate(unique_sources.values(), 1):
-        formatted_text += f"Source {source.get('title', 'Untitled')}:\n===\n"
-        formatted_text += f"URL: {source['url']}\n===\n"
-        formatted_text += f"Most relevant content from source: {source.get('content', 'No content available')}\n===\n"
+    # truncate raw webpage content to a certain number of tokens to prevent exceeding LLM max token window
+    # all pages of the call are truncated in one batch, pages already truncated in this run are reused
+    truncated_contents = {}
+    if include_raw_content:
+        raw_sources = [
+            (source['url'], source['raw_content'])
+            for source in unique_sources.values()
+            if source.get('raw_content')
+        ]
+        truncated = document_store.truncated_raw_contents(raw_sources, max_tokens, truncate_batch)
+        truncated_contents = {url: result for (url, _), result in zip(raw_sources, truncated)}
 
-        if include_raw_content:
-            # truncate raw webpage content to a certain number of tokens to prevent exceeding LLM max token window
-            raw_content = source.get("raw_content", "")
-            if raw_content:
-                tokens = encoding.encode(raw_content)
-                truncated_tokens = tokens[:max_tokens]
-                truncated_content = encoding.decode(truncated_tokens)
-                formatted_text += f"Raw Content: {truncated_content}\n\n"
+    header = "Content from web search:\n\n"
+    remaining = None if max_total_tokens is None else max_total_tokens - count_tokens(header) - OMITTED_NOTE_TOKENS
+    yield header
 
-    return formatted_text.strip()
+    sources = list(unique_sources.values())
+    for i, source in enumerate(sources):
+        summary = (
+            f"Source {source.get('title', 'Untitled')}:\n===\n"
+            f"URL: {source['url']}\n===\n"
+            f"Most relevant content from source: {source.get('content', 'No content available')}\n===\n"
+        )
+        truncated_content = truncated_contents.get(source['url']) if include_raw_content else None
 
+        if remaining is not None:
+            summary_tokens = count_tokens(summary)
+            if summary_tokens > remaining:
+                yield f"[{len(sources) - i} more sources left out to fit the context budget]"
+                return
+            remaining -= summary_tokens
+            if truncated_content and remaining > RAW_CONTENT_LABEL_TOKENS:
+                # Leave room for the "Raw Content: " label and separator
+                remaining -= RAW_CONTENT_LABEL_TOKENS
+                if truncated_content[1] > remaining:
+                    # Cut this page down to whatever is left of the budget; the one-off cut is not stored
+                    truncated_content = truncate_to_tokens(truncated_content[0], remaining)
+                remaining -= truncated_content[1]
+            else:
+                truncated_content = None
 
-def format_sections(sections: List) -> str:
-    """Format a list of report sections into a single text string."""
-    formatted_str = ""
+        yield summary
+        if truncated_content and truncated_content[0]:
+            yield f"Raw Content: {truncated_content[0]}\n\n"
+
+
+def format_search_query_results(
+    search_response: Union[Dict[str, Any], List[Any]],
+    max_tokens: int = 2000,
+    include_raw_content: bool = False,
+    max_total_tokens: Optional[int] = None
+) -> str:
+    """
+    Extract the context from tavily search results,
+    make sure content is not duplicated from same urls and format it to show the Source, URL,
+    relevant content (and optionally raw content which can be truncated based on number of tokens)
+    """
+    with trace("format_search_query_results", "format") as span:
+        formatted = "".join(
+            iter_search_query_results(search_response, max_tokens, include_raw_content, max_total_tokens)
+        ).strip()
+        span.attributes["bytes"] = len(formatted.encode("utf-8"))
+    return formatted
+
+
+def iter_sections(sections: List) -> Iterator[str]:
+    """Yield each report section formatted as one chunk."""
     for idx, section in enumerate(sections, 1):
-        formatted_str += f"""
+        yield f"""
 {'='*60}
 Section {idx}: {section.name}
 {'='*60}
@@ -82,4 +149,67 @@ Content:
 {section.content if section.content else '[Not yet written]'}
 
 """
-    return formatted_str
+
+
+def format_sections(sections: List) -> str:
+    """Format a list of report sections into a single text string."""
+    with trace("format_sections", "format") as span:
+        formatted = "".join(iter_sections(sections))
+        span.attributes["bytes"] = len(formatted.encode("utf-8"))
+    return formatted
+
+
+def iter_section_digests(
+    sections: List,
+    digests: Dict[str, str],
+    max_total_tokens: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Yield each report section formatted with its digest in place of its content.
+    Sections without a digest keep their full content. When the digests add up to more than
+    max_total_tokens, each one is cut to an equal share of the budget.
+    """
+    texts = [digests.get(section.name, section.content) for section in sections]
+    if max_total_tokens is not None and texts:
+        if sum(count_tokens(text) for text in texts) > max_total_tokens:
+            # At least one token each, since a cap of 0 would not cut anything
+            texts = [text for text, _ in truncate_batch(texts, max(1, max_total_tokens // len(texts)))]
+
+    for idx, (section, text) in enumerate(zip(sections, texts), 1):
+        yield f"""
+{'='*60}
+Section {idx}: {section.name}
+{'='*60}
+Description:
+{section.description}
+
+{'Summary' if section.name in digests else 'Content'}:
+{text}
+
+"""
+
+
+def format_section_digests(
+    sections: List,
+    digests: Dict[str, str],
+    max_total_tokens: Optional[int] = None
+) -> str:
+    """Format report sections by their digests into a single text string, within max_total_tokens."""
+    with trace("format_section_digests", "format") as span:
+        formatted = "".join(iter_section_digests(sections, digests, max_total_tokens))
+        span.attributes["bytes"] = len(formatted.encode("utf-8"))
+    return formatted
+
+
+def build_prompt(template: str, context: Iterable[str], context_field: str = "context", **fields: Any) -> str:
+    """
+    Fill a prompt template whose `context_field` placeholder is fed from a stream of chunks.
+    The chunks are joined straight into the prompt instead of first being joined into a context
+    string that str.format would then copy again.
+    """
+    placeholder = "{" + context_field + "}"
+    before, after = template.split(placeholder, 1)
+    with trace("build_prompt", "format") as span:
+        prompt = "".join([before.format(**fields), *context, after.format(**fields)])
+        span.attributes["bytes"] = len(prompt.encode("utf-8"))
+    return prompt
@@ -0,0 +1,125 @@
+"""
+Shared HTTP connection pool for the OpenAI and Tavily clients.
+
+Every LLM call and search goes through one httpx client, so concurrent section branches reuse
+kept-alive connections (and TLS sessions) instead of each client opening its own. Connections
+belong to an event loop, so the transport keeps one pool per running loop behind the single
+client; that lets the client be created once and handed to ChatOpenAI at construction.
+"""
+import asyncio
+import os
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+
+# Connection pool settings, shared by all OpenAI and Tavily requests of the process
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Seconds an idle connection is kept open for reuse
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# HTTP_HTTP2: "auto" (when the optional h2 package is installed), "on" or "off"
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "auto")
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "120"))
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """
+    One connection pool per event loop behind a single transport, counting requests, new
+    connections and TLS handshakes so connection reuse can be checked in the run statistics.
+    """
+
+    def __init__(self, limits: httpx.Limits, http2: bool = False):
+        self.limits = limits
+        self.http2 = http2
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.errors = 0
+        self.http_versions: Dict[str, int] = {}
+        self._pools = weakref.WeakKeyDictionary()
+
+    def _pool(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        if loop not in self._pools:
+            self._pools[loop] = httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+        return self._pools[loop]
+
+    async def _trace(self, event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        request.extensions = {**request.extensions, "trace": self._trace}
+        try:
+            response = await self._pool().handle_async_request(request)
+        except Exception:
+            self.errors += 1
+            raise
+        version = response.extensions.get("http_version", b"HTTP/1.1").decode("ascii", "replace")
+        self.http_versions[version] = self.http_versions.get(version, 0) + 1
+        return response
+
+    async def aclose(self) -> None:
+        """Close the pool of the running event loop."""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests and connections of this process; `reused` requests went over an already open connection."""
+        open_connections = sum(
+            len(getattr(getattr(pool, "_pool", None), "connections", []))
+            for pool in list(self._pools.values())
+        )
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "reused": max(0, self.requests - self.errors - self.connections_opened),
+            "tls_handshakes": self.tls_handshakes,
+            "open_connections": open_connections,
+            "errors": self.errors,
+            "http_versions": dict(self.http_versions),
+        }
+
+
+# Initialize the client lazily so importing the module does not configure anything
+http_client: Optional[httpx.AsyncClient] = None
+http_transport: Optional[PooledTransport] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the HTTP client shared by the OpenAI and Tavily clients, initializing it if needed."""
+    global http_client, http_transport
+    if http_client is None:
+        http2 = HTTP_HTTP2 == "on" or (HTTP_HTTP2 == "auto" and http2_available())
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+        http_transport = PooledTransport(limits, http2=http2)
+        http_client = httpx.AsyncClient(
+            transport=http_transport,
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=10.0)
+        )
+    return http_client
+
+
+def get_http_pool_stats() -> Dict[str, Any]:
+    """Connection pool statistics of the shared client (empty before the first request)."""
+    if http_transport is None:
+        return {}
+    return http_transport.stats()
@@ -0,0 +1,275 @@
+"""
+LLM call utilities shared by the agent nodes.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional, Set, Type
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config, merge_configs
+
+from src.utils.cache import DiskCache, make_cache_key
+from src.utils.http import get_http_client
+from src.utils.metrics import trace
+from src.utils.rate_limit import RateLimiter, RetryPolicy, get_rate_limiter, retry_async
+from src.utils.run_context import get_run_context
+
+
+# Maximum number of LLM requests allowed in flight at once across all graph nodes
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Sustained LLM requests per second (0 disables the rate limit)
+LLM_RPS = float(os.getenv("LLM_RPS", "5"))
+# Attempts per LLM call, retrying rate limits, server errors and timeouts with jittered backoff
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+
+LLM_RETRY_POLICY = RetryPolicy(max_attempts=LLM_MAX_ATTEMPTS)
+
+# LLM response cache settings
+# LLM_CACHE_MODE: "on" (read and write), "refresh" (skip reads, store fresh responses) or "off" (bypass)
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "on")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+# Graph nodes whose calls are never cached, comma separated (e.g. "write_section,write_final_sections")
+LLM_CACHE_SKIP_NODES = {node.strip() for node in os.getenv("LLM_CACHE_SKIP_NODES", "").split(",") if node.strip()}
+
+# Model routing: LLM_MODEL serves every node not listed in LLM_NODE_MODELS,
+# e.g. LLM_NODE_MODELS="generate_queries=gpt-4o-mini,generate_report_plan=gpt-4o-mini"
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+LLM_NODE_MODELS = dict(
+    (part.split("=", 1)[0].strip(), part.split("=", 1)[1].strip())
+    for part in os.getenv("LLM_NODE_MODELS", "").split(",") if "=" in part
+)
+# OpenAI-compatible endpoint for every model, e.g. a local server for testing (default: OpenAI)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+
+# USD per million input / output tokens, matched on the longest model name prefix.
+# LLM_PRICES adds or overrides entries as JSON, e.g. '{"llama3": [0, 0]}', read when a usage report is made
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "o4-mini": (1.10, 4.40),
+}
+
+
+def model_for_node(node: Optional[str]) -> str:
+    """Model that serves a graph node."""
+    return LLM_NODE_MODELS.get(node, LLM_MODEL) if node else LLM_MODEL
+
+
+def routed_models() -> Set[str]:
+    """Every model the routing configuration can select."""
+    return {LLM_MODEL, *LLM_NODE_MODELS.values()}
+
+
+# Initialize the chat models lazily: importing langchain_openai and building the client is the
+# slowest part of startup, and it needs OPENAI_API_KEY, which `--help` or a resumed run may not
+chat_models: Dict[str, Any] = {}
+
+
+def get_llm(node: Optional[str] = None) -> Any:
+    """Get the chat model routed to a graph node, shared by every node using that model, initializing it if needed."""
+    model = model_for_node(node)
+    if model not in chat_models:
+        from langchain_openai import ChatOpenAI
+
+        # Retries are handled by ainvoke_llm, so the client itself does not retry.
+        # Requests go over the shared connection pool. A local endpoint usually needs no key
+        endpoint = {"base_url": LLM_BASE_URL, "api_key": os.getenv("OPENAI_API_KEY") or "local"} \
+            if LLM_BASE_URL else {}
+        chat_models[model] = ChatOpenAI(
+            model_name=model, temperature=0, max_retries=0, http_async_client=get_http_client(), **endpoint
+        )
+    return chat_models[model]
+
+
+def model_prices() -> Dict[str, tuple]:
+    """The built-in model prices with the entries of LLM_PRICES, which must map model names to [input, output]."""
+    try:
+        overrides = json.loads(os.getenv("LLM_PRICES", "{}"))
+        if not isinstance(overrides, dict):
+            raise ValueError("not a JSON object")
+        for name, price in overrides.items():
+            if not (isinstance(price, list) and len(price) == 2
+                    and all(isinstance(p, (int, float)) and not isinstance(p, bool) for p in price)):
+                raise ValueError(f"price of {name!r} is not [input, output]")
+    except ValueError as e:
+        raise ValueError(
+            f"Invalid LLM_PRICES, expected JSON like '{{\"llama3\": [0.5, 1.5]}}' (USD per million tokens): {e}"
+        ) from None
+    return {**MODEL_PRICES, **{name: tuple(price) for name, price in overrides.items()}}
+
+
+def model_price(model: str, prices: Dict[str, tuple]) -> Optional[tuple]:
+    """Price of a model (or of a dated version of it), None when unknown."""
+    matches = [name for name in prices if model == name or model.startswith(name + "-")]
+    return prices[max(matches, key=len)] if matches else None
+
+
+# Initialize the response cache lazily so importing the module does not touch the disk
+llm_cache = None
+
+
+def get_llm_cache() -> DiskCache:
+    """Get the on-disk LLM response cache, initializing it if needed."""
+    global llm_cache
+    if llm_cache is None:
+        llm_cache = DiskCache(
+            LLM_CACHE_PATH,
+            namespace="llm",
+            ttl_seconds=LLM_CACHE_TTL_SECONDS,
+            max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024)
+        )
+    return llm_cache
+
+
+def get_llm_limiter() -> RateLimiter:
+    """Get the OpenAI rate limiter for the running event loop."""
+    return get_rate_limiter("openai", LLM_RPS, LLM_MAX_CONCURRENCY)
+
+
+def _current_node() -> str:
+    """Name of the graph node making the call, used to group retry accounting."""
+    try:
+        from langgraph.config import get_config
+        return get_config()["metadata"].get("langgraph_node", "llm")
+    except Exception:
+        return "llm"
+
+
+def llm_cache_key(llm: Any, messages: List[BaseMessage], schema: Optional[Type] = None) -> str:
+    """Cache key of a call: the model and its parameters, the messages and the output schema."""
+    model = {"class": type(llm).__name__, **getattr(llm, "_identifying_params", {})}
+    schema_json = schema.model_json_schema() if schema is not None else None
+    return make_cache_key(model, [(m.type, m.content) for m in messages], schema_json)
+
+
+def _serialize(result: Any, schema: Optional[Type]) -> Any:
+    return result.model_dump() if schema is not None else {"content": result.content}
+
+
+def _deserialize(value: Any, schema: Optional[Type]) -> Any:
+    return schema.model_validate(value) if schema is not None else AIMessage(content=value["content"])
+
+
+async def ainvoke_llm(
+    llm: Any,
+    messages: List[BaseMessage],
+    config: Optional[RunnableConfig] = None,
+    schema: Optional[Type] = None,
+    cache: bool = True,
+    max_tokens: Optional[int] = None
+) -> Any:
+    """
+    Invoke a chat model asynchronously, returning an instance of `schema` when one is given
+    (through llm.with_structured_output) and the model's message otherwise.
+    Calls go through the shared OpenAI rate limiter (LLM_RPS, LLM_MAX_CONCURRENCY) and are retried
+    on retryable errors; retries are recorded in the run statistics under the calling node.
+    Responses are cached on disk by model, messages and schema (LLM_CACHE_MODE); pass cache=False
+    or list the node in LLM_CACHE_SKIP_NODES to always call the model.
+    Latency, prompt/completion tokens and cache hits are recorded as an "llm" span, and the tokens
+    are charged to the run's token budget. `max_tokens` caps the completion, e.g. as allocated by the budget.
+    `config` is merged into the config of the calling graph node, e.g. to tag the call with metadata.
+    """
+    node = _current_node()
+    if max_tokens is not None:
+        llm = llm.model_copy(update={"max_tokens": max_tokens})
+    use_cache = cache and LLM_CACHE_MODE != "off" and node not in LLM_CACHE_SKIP_NODES
+    key = llm_cache_key(llm, messages, schema) if use_cache else None
+    runnable = llm.with_structured_output(schema) if schema is not None else llm
+
+    usage = UsageMetadataCallbackHandler()
+    # Merge rather than replace, so the graph's callbacks (streaming, tracing) still see the call
+    call_config = merge_configs(ensure_config(), config or {}, {"callbacks": [usage]})
+
+    with trace(node, "llm", model=getattr(llm, "model_name", type(llm).__name__)) as span:
+        if use_cache and LLM_CACHE_MODE != "refresh":
+            cached = await asyncio.to_thread(get_llm_cache().get, key)
+            span.attributes["cached"] = cached is not None
+            if cached is not None:
+                return _deserialize(cached, schema)
+
+        result = await retry_async(
+            lambda: runnable.ainvoke(messages, config=call_config),
+            LLM_RETRY_POLICY,
+            limiter=get_llm_limiter(),
+            stats=get_run_context().retries,
+            provider="openai",
+            key=node
+        )
+        for model, tokens in usage.usage_metadata.items():
+            span.attributes["model"] = model
+            span.attributes["input_tokens"] = span.attributes.get("input_tokens", 0) + tokens.get("input_tokens", 0)
+            span.attributes["output_tokens"] = span.attributes.get("output_tokens", 0) + tokens.get("output_tokens", 0)
+        get_run_context().budget.charge(span.attributes.get("input_tokens", 0), span.attributes.get("output_tokens", 0))
+
+    if use_cache:
+        await asyncio.to_thread(get_llm_cache().set, key, _serialize(result, schema))
+    return result
+
+
+def model_usage_report(spans: List[Any]) -> Dict[str, Any]:
+    """
+    Calls, latency, tokens and cost of a run's LLM calls (the "llm" spans) by node and model.
+    Cache hits count as calls without tokens; cost is None for models without a known price.
+    """
+    by_node: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for span in spans:
+        if span.kind != "llm":
+            continue
+        model = span.attributes.get("model", "unknown")
+        entry = by_node.setdefault(span.name, {}).setdefault(model, {
+            "calls": 0, "cached": 0, "total_s": 0.0, "max_s": 0.0,
+            "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0,
+        })
+        entry["calls"] += 1
+        entry["cached"] += int(bool(span.attributes.get("cached")))
+        entry["total_s"] += span.duration
+        entry["max_s"] = max(entry["max_s"], span.duration)
+        entry["input_tokens"] += span.attributes.get("input_tokens", 0)
+        entry["output_tokens"] += span.attributes.get("output_tokens", 0)
+
+    prices = model_prices()
+    by_model: Dict[str, Dict[str, Any]] = {}
+    for models in by_node.values():
+        for model, entry in models.items():
+            price = model_price(model, prices)
+            entry["cost_usd"] = None if price is None else round(
+                (entry["input_tokens"] * price[0] + entry["output_tokens"] * price[1]) / 1e6, 6
+            )
+            entry["mean_s"] = round(entry["total_s"] / entry["calls"], 3)
+            entry["total_s"] = round(entry["total_s"], 3)
+            entry["max_s"] = round(entry["max_s"], 3)
+            total = by_model.setdefault(model, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0})
+            for key in ("calls", "input_tokens", "output_tokens"):
+                total[key] += entry[key]
+            total["cost_usd"] = None if entry["cost_usd"] is None or total["cost_usd"] is None \
+                else round(total["cost_usd"] + entry["cost_usd"], 6)
+    return {
+        "by_node": by_node,
+        "by_model": by_model,
+        "cost_usd": round(sum(m["cost_usd"] or 0.0 for m in by_model.values()), 6),
+    }
+
+
+def print_model_usage(report: Dict[str, Any]) -> None:
+    """Print the usage report as a table."""
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title="LLM usage by node and model")
+    for column in ("node", "model", "calls", "cached", "mean s", "max s", "in tokens", "out tokens", "cost $"):
+        table.add_column(column, justify="left" if column in ("node", "model") else "right", no_wrap=True)
+    for node, models in report["by_node"].items():
+        for model, e in models.items():
+            cost = "?" if e["cost_usd"] is None else f"{e['cost_usd']:.4f}"
+            table.add_row(node, model, str(e["calls"]), str(e["cached"]), f"{e['mean_s']:.2f}",
+                          f"{e['max_s']:.2f}", str(e["input_tokens"]), str(e["output_tokens"]), cost)
+    Console(width=max(Console().width, 120)).print(table)
+    print(f"LLM cost: ${report['cost_usd']:.4f}")
@@ -0,0 +1,157 @@
+"""
+Run manifests and section fingerprints, for regenerating a report incrementally.
+
+Every run records its plan and, per section, the search queries, the written content and a
+fingerprint of everything the content was written from (description, queries, formatted sources,
+prompt template and model; for final sections the content of the research sections they use).
+The manifest is saved next to the report. An incremental run starts from a saved manifest: it
+reuses the plan (with any edited descriptions) and the queries of unedited sections, searches
+again, and only writes the sections whose fingerprint changed, so the other sections keep their
+previous content at the cost of their searches.
+"""
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.models.schemas import SearchQuery, Section
+from src.utils.cache import make_cache_key
+
+
+MANIFEST_VERSION = 1
+
+
+def fingerprint(*parts: Any) -> str:
+    """Fingerprint of the inputs a section is written from."""
+    return make_cache_key("section", *parts)
+
+
+def manifest_path(report_path: str) -> str:
+    """Path of the manifest saved next to a report, e.g. outputs/final_output.manifest.json."""
+    return os.path.splitext(report_path)[0] + ".manifest.json"
+
+
+class RunManifest:
+    """Plan of one run and, per written section, its queries, fingerprint and content."""
+
+    def __init__(self, topic: Optional[str] = None):
+        self.topic = topic
+        self.sections: List[Section] = []
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    def set_plan(self, sections: List[Section]) -> None:
+        self.sections = [section.model_copy() for section in sections]
+
+    def record(
+        self,
+        section: Section,
+        section_fingerprint: str,
+        content: str,
+        queries: Optional[List[SearchQuery]] = None
+    ) -> None:
+        """Record a written (or reused) section."""
+        self.entries[section.name] = {
+            "description": section.description,
+            "fingerprint": section_fingerprint,
+            "queries": [query.search_query for query in queries] if queries is not None else None,
+            "content": content,
+        }
+
+    def content_fingerprints(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Hashes of the content of the named sections, which a final section's fingerprint is built from."""
+        return {
+            name: make_cache_key(self.entries[name]["content"]) if name in self.entries else None
+            for name in sorted(names)
+        }
+
+    def is_complete(self) -> bool:
+        """Whether every section of the plan was recorded, e.g. not after resuming a checkpointed run."""
+        return bool(self.sections) and all(section.name in self.entries for section in self.sections)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "topic": self.topic,
+            "sections": [section.model_dump(exclude={"content"}) for section in self.sections],
+            "entries": self.entries,
+        }
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "RunManifest":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version {data.get('version')} in {path}")
+        manifest = cls(data["topic"])
+        manifest.sections = [Section(content="", **section) for section in data["sections"]]
+        manifest.entries = data["entries"]
+        return manifest
+
+
+class Regeneration:
+    """
+    What an incremental run takes from a previous run's manifest: the plan with `edits` (new
+    descriptions by section name) applied, the queries of sections whose description is unchanged,
+    and the content of sections whose fingerprint matches. Sections in `refresh` are regenerated
+    whatever their fingerprint, bypassing the LLM cache.
+    """
+
+    def __init__(
+        self,
+        previous: RunManifest,
+        edits: Optional[Dict[str, str]] = None,
+        refresh: Iterable[str] = ()
+    ):
+        names = {section.name for section in previous.sections}
+        unknown = sorted((set(edits or {}) | set(refresh)) - names)
+        if unknown:
+            raise ValueError(f"Unknown sections {unknown}, the plan has {sorted(names)}")
+        self.previous = previous
+        self.edits = dict(edits or {})
+        self.refresh = set(refresh)
+        self.reused: List[str] = []
+        self.rerun: List[str] = []
+
+    def plan(self) -> List[Section]:
+        """The previous plan with the edited descriptions."""
+        return [
+            section.model_copy(update={"description": self.edits.get(section.name, section.description), "content": ""})
+            for section in self.previous.sections
+        ]
+
+    def queries(self, section: Section) -> Optional[List[SearchQuery]]:
+        """The previous queries of a section, unless it was edited or is refreshed."""
+        entry = self.previous.entries.get(section.name)
+        if (
+            entry is None or entry.get("queries") is None or section.name in self.refresh
+            or entry["description"] != section.description
+        ):
+            return None
+        return [SearchQuery(search_query=query) for query in entry["queries"]]
+
+    def reuse(self, section: Section, section_fingerprint: str) -> Optional[str]:
+        """The previous content of a section when its fingerprint is unchanged, otherwise None."""
+        entry = self.previous.entries.get(section.name)
+        if entry is not None and section.name not in self.refresh and entry["fingerprint"] == section_fingerprint:
+            self.reused.append(section.name)
+            return entry["content"]
+        self.rerun.append(section.name)
+        return None
+
+    def use_cache(self, section: Section) -> bool:
+        """Whether LLM calls for the section may be answered from the LLM cache."""
+        return section.name not in self.refresh
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reused": sorted(self.reused),
+            "rerun": sorted(self.rerun),
+            "edited": sorted(self.edits),
+            "refreshed": sorted(self.refresh),
+        }
@@ -0,0 +1,250 @@
+"""
+Instrumentation for the hot paths of a run: graph nodes, LLM calls, searches and formatters.
+
+Every measurement is a span (name, kind, start/end time, attributes) collected in the RunMetrics
+of the current run. Spans nest through a ContextVar, export as JSON in an OpenTelemetry-like
+layout and are aggregated into a summary table at the end of a run.
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+@dataclass
+class Span:
+    """One timed operation."""
+    name: str
+    kind: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    # CPU time of the running thread, meaningful for synchronous work such as formatting
+    cpu_time: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class RunMetrics:
+    """Spans recorded during one run."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes: Any) -> Iterator[Span]:
+        """Time the block as a child of the current span; attributes can be added to the yielded span."""
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            kind=kind,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        cpu_start = time.thread_time()
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.cpu_time = time.thread_time() - cpu_start
+            span.end = time.time()
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    def export(self) -> List[Dict[str, Any]]:
+        """Spans in an OpenTelemetry-like JSON layout."""
+        return [
+            {
+                "trace_id": self.trace_id,
+                "span_id": span.span_id,
+                "parent_span_id": span.parent_id,
+                "name": span.name,
+                "kind": span.kind,
+                "start_time_unix_nano": int(span.start * 1e9),
+                "end_time_unix_nano": int((span.end or span.start) * 1e9),
+                "attributes": span.attributes,
+            }
+            for span in sorted(self.spans, key=lambda s: s.start)
+        ]
+
+    def export_json(self, path: str) -> None:
+        """Write the exported spans to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"trace_id": self.trace_id, "spans": self.export()}, f, indent=2, default=str)
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate spans by kind and name, and node time by section."""
+        by_name: Dict[str, Dict[str, Any]] = {}
+        sections: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            entry = by_name.setdefault(f"{span.kind}:{span.name}", {
+                "kind": span.kind, "name": span.name, "count": 0, "total_s": 0.0, "max_s": 0.0,
+                "cpu_s": 0.0, "input_tokens": 0, "output_tokens": 0, "results": 0, "bytes": 0, "cached": 0,
+            })
+            entry["count"] += 1
+            entry["total_s"] += span.duration
+            entry["max_s"] = max(entry["max_s"], span.duration)
+            entry["cpu_s"] += span.cpu_time
+            for key in ("input_tokens", "output_tokens", "results", "bytes", "cached"):
+                entry[key] += int(span.attributes.get(key, 0) or 0)
+
+            section = span.attributes.get("section")
+            if section and span.kind == "node":
+                timing = sections.setdefault(section, {"start": span.start, "end": span.end or span.start})
+                timing["start"] = min(timing["start"], span.start)
+                timing["end"] = max(timing["end"], span.end or span.start)
+
+        for entry in by_name.values():
+            for key in ("total_s", "max_s", "cpu_s"):
+                entry[key] = round(entry[key], 3)
+        return {
+            "spans": sorted(by_name.values(), key=lambda e: (e["kind"], -e["total_s"])),
+            "sections": {
+                name: round(timing["end"] - timing["start"], 3) for name, timing in sections.items()
+            },
+            "critical_path": self.critical_path(),
+        }
+
+    def critical_path(self) -> Dict[str, Any]:
+        """
+        When each final section could start, did start and finished, relative to the start of the run.
+        `barrier_s` is when the last research section was written, which is when final sections start
+        under barrier scheduling; `barrier_finish_s` estimates when each final section would have finished
+        had it started then, so `saved_s` is the wall time eager scheduling saved (zero under the barrier).
+        """
+        if not self.spans:
+            return {}
+        run_start = min(span.start for span in self.spans)
+        # A research section is done once it is written and digested
+        research_done: Dict[str, float] = {}
+        for span in self.spans:
+            if span.kind == "node" and span.name in ("write_section", "digest_section") \
+                    and span.attributes.get("section"):
+                name = span.attributes["section"]
+                research_done[name] = max(research_done.get(name, 0.0), (span.end or span.start) - run_start)
+        waits = {
+            span.attributes["section"]: span for span in self.spans
+            if span.kind == "wait" and span.attributes.get("section")
+        }
+        finals = [span for span in self.spans if span.kind == "node" and span.name == "write_final_sections"]
+        if not research_done or not finals:
+            return {}
+
+        barrier = max(research_done.values())
+        sections = {}
+        for span in finals:
+            name = span.attributes.get("section")
+            wait = waits.get(name)
+            depends_on = (wait.attributes.get("depends_on") if wait else None) or list(research_done)
+            work = span.duration - (wait.duration if wait else 0.0)
+            sections[name] = {
+                "depends_on": depends_on,
+                "ready_s": round(max(research_done.get(d, barrier) for d in depends_on), 3),
+                "started_s": round(span.start - run_start + (wait.duration if wait else 0.0), 3),
+                "finished_s": round((span.end or span.start) - run_start, 3),
+                "barrier_finish_s": round(max(barrier, (span.end or span.start) - run_start - work) + work, 3),
+            }
+        finished = max(s["finished_s"] for s in sections.values())
+        barrier_finished = max(s["barrier_finish_s"] for s in sections.values())
+        return {
+            "barrier_s": round(barrier, 3),
+            "sections": sections,
+            "finished_s": finished,
+            "barrier_finish_s": barrier_finished,
+            "saved_s": round(max(0.0, barrier_finished - finished), 3),
+        }
+
+    def print_summary(self) -> None:
+        """Print the summary as tables."""
+        from rich.console import Console
+        from rich.table import Table
+
+        summary = self.summary()
+        table = Table(title="Run instrumentation")
+        for column in ("kind", "name", "count", "total s", "max s", "cpu s", "in tokens", "out tokens",
+                       "results", "bytes", "cached"):
+            table.add_column(column, justify="left" if column in ("kind", "name") else "right", no_wrap=True)
+        for e in summary["spans"]:
+            table.add_row(e["kind"], e["name"], str(e["count"]), f"{e['total_s']:.2f}", f"{e['max_s']:.2f}",
+                          f"{e['cpu_s']:.2f}", str(e["input_tokens"]), str(e["output_tokens"]),
+                          str(e["results"]), str(e["bytes"]), str(e["cached"]))
+
+        console = Console(width=max(Console().width, 120))
+        console.print(table)
+        if summary["sections"]:
+            sections = Table(title="Wall time per section")
+            sections.add_column("section")
+            sections.add_column("wall s", justify="right")
+            for name, seconds in sorted(summary["sections"].items(), key=lambda item: -item[1]):
+                sections.add_row(name, f"{seconds:.2f}")
+            console.print(sections)
+
+        critical_path = summary["critical_path"]
+        if critical_path:
+            finals = Table(title=f"Final sections (last research section done at {critical_path['barrier_s']:.2f}s)")
+            for column in ("section", "depends on", "ready s", "started s", "finished s", "with barrier s"):
+                finals.add_column(column, justify="left" if column in ("section", "depends on") else "right")
+            for name, timing in critical_path["sections"].items():
+                finals.add_row(name, ", ".join(timing["depends_on"]), f"{timing['ready_s']:.2f}",
+                               f"{timing['started_s']:.2f}", f"{timing['finished_s']:.2f}",
+                               f"{timing['barrier_finish_s']:.2f}")
+            console.print(finals)
+            console.print(f"Final sections finished at {critical_path['finished_s']:.2f}s, "
+                          f"{critical_path['barrier_finish_s']:.2f}s behind a barrier: "
+                          f"{critical_path['saved_s']:.2f}s saved")
+
+
+def get_metrics() -> RunMetrics:
+    """Metrics of the current run."""
+    # Imported here because the run context itself holds a RunMetrics
+    from src.utils.run_context import get_run_context
+    return get_run_context().metrics
+
+
+@contextmanager
+def trace(name: str, kind: str, **attributes: Any) -> Iterator[Span]:
+    """Record a span in the metrics of the current run."""
+    with get_metrics().span(name, kind, **attributes) as span:
+        yield span
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wrap a graph node so its wall time is recorded, tagged with the section it works on."""
+
+    def attributes(state: Any) -> Dict[str, Any]:
+        section = state.get("section") if isinstance(state, dict) else None
+        return {"section": section.name} if section is not None else {}
+
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state):
+            with trace(name, "node", **attributes(state)):
+                return await node(state)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state):
+        with trace(name, "node", **attributes(state)):
+            return node(state)
+    return wrapper
@@ -0,0 +1,167 @@
+"""
+Persistent local index of the pages fetched from Tavily, shared by all runs.
+
+Every page a search returns is stored with its (truncated) raw content, split into passages and
+indexed with SQLite FTS5. Before calling Tavily, a query is looked up in the index; when enough
+stored pages cover the query's terms they are returned in the Tavily response format, and only
+queries the index cannot answer (coverage gaps) go to the API.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.utils.context_packing import split_passages
+from src.utils.query_registry import query_terms, tokenize
+from src.utils.tokens import truncate_to_tokens
+
+
+class PassageIndex:
+    """Pages and their passages in a SQLite file, with FTS5 full-text search over the passages."""
+
+    def __init__(
+        self,
+        path: str,
+        page_tokens: int = 4000,
+        passage_tokens: int = 200,
+        min_term_coverage: float = 0.6,
+        max_bytes: Optional[int] = None
+    ):
+        self.path = path
+        self.page_tokens = page_tokens
+        self.passage_tokens = passage_tokens
+        self.min_term_coverage = min_term_coverage
+        self.max_bytes = max_bytes
+        self.lookups = 0
+        self.answered = 0
+        self.pages_added = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use so creating an index costs nothing."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS pages (
+                       url TEXT PRIMARY KEY,
+                       title TEXT NOT NULL,
+                       content TEXT NOT NULL,
+                       text TEXT,
+                       size INTEGER NOT NULL,
+                       fetched_at REAL NOT NULL
+                   )"""
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5("
+                "url UNINDEXED, position UNINDEXED, text, tokenize='porter unicode61')"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def add_results(self, search_response: Dict[str, Any]) -> None:
+        """Store the pages of one Tavily response, replacing stored pages that had no raw content."""
+        results = [
+            result for result in search_response.get("results", [])
+            if isinstance(result, dict) and result.get("url")
+        ]
+        if not results:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            for result in results:
+                url = result["url"]
+                row = conn.execute("SELECT text IS NOT NULL FROM pages WHERE url = ?", (url,)).fetchone()
+                raw_content = result.get("raw_content")
+                if row is not None and (row[0] or not raw_content):
+                    continue
+
+                content = result.get("content") or ""
+                text, tokens = truncate_to_tokens(raw_content, self.page_tokens) if raw_content else (None, 0)
+                conn.execute("DELETE FROM passages WHERE url = ?", (url,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, title, content, text, size, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, result.get("title") or "Untitled", content, text,
+                     len(content) + len(text or ""), now)
+                )
+                passages = split_passages(url, text, tokens, self.passage_tokens) if text else []
+                conn.executemany(
+                    "INSERT INTO passages (url, position, text) VALUES (?, ?, ?)",
+                    [(url, -1, content)] + [(url, p.position, p.text) for p in passages]
+                )
+                self.pages_added += 1
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop the oldest pages until the index fits in max_bytes."""
+        if self.max_bytes is None:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in conn.execute("SELECT url, size FROM pages ORDER BY fetched_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            conn.execute("DELETE FROM passages WHERE url = ?", (url,))
+            total -= size
+
+    def lookup(self, query: str, max_results: int, include_raw_content: bool) -> Optional[Dict[str, Any]]:
+        """
+        Answer a query from the index in the Tavily response format, or return None when fewer than
+        max_results stored pages cover at least min_term_coverage of the query's terms.
+        """
+        terms = query_terms(query)
+        words = {word for word in query.lower().split() if tokenize(word)}
+        with self._lock:
+            self.lookups += 1
+            if not terms or not words:
+                return None
+            conn = self._connect()
+            match = " OR ".join('"' + word.replace('"', '""') + '"' for word in sorted(words))
+            rows = conn.execute(
+                "SELECT url, text FROM passages WHERE passages MATCH ? ORDER BY bm25(passages) LIMIT ?",
+                (match, max_results * 20)
+            ).fetchall()
+
+            # Pages in order of their best passage, with the query terms their passages cover
+            covered: Dict[str, set] = {}
+            for url, text in rows:
+                covered.setdefault(url, set()).update(terms.intersection(tokenize(text)))
+            urls = [url for url, found in covered.items() if len(found) / len(terms) >= self.min_term_coverage]
+
+            results = []
+            for url in urls:
+                page = conn.execute(
+                    "SELECT title, content, text FROM pages WHERE url = ?", (url,)
+                ).fetchone()
+                if page is None or (include_raw_content and page[2] is None):
+                    continue
+                result = {"url": url, "title": page[0], "content": page[1], "score": len(covered[url]) / len(terms)}
+                if include_raw_content:
+                    result["raw_content"] = page[2]
+                results.append(result)
+                if len(results) == max_results:
+                    break
+
+            if len(results) < max_results:
+                return None
+            self.answered += 1
+        return {"query": query, "results": results, "from_index": True}
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookups answered from the index and pages added in this process."""
+        return {
+            "lookups": self.lookups,
+            "answered": self.answered,
+            "gaps": self.lookups - self.answered,
+            "pages_added": self.pages_added,
+        }
@@ -0,0 +1,140 @@
+"""
+Run-wide search query deduplication.
+
+The planner and every section generate their own queries, and many of them are near-paraphrases
+of each other. The registry collapses a query onto an earlier one of the same run when their
+normalized word sets are similar enough (Jaccard similarity of stemmed content words), and shares
+that search's results with every requester instead of calling Tavily again.
+"""
+import asyncio
+import os
+import re
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional
+
+
+# Word-set similarity at or above which two queries are treated as the same search (1 = exact matches only)
+QUERY_DEDUP_THRESHOLD = float(os.getenv("QUERY_DEDUP_THRESHOLD", "0.75"))
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it its of on or the to vs versus what when where "
+    "which who why with about between does do latest recent".split()
+)
+
+
+@lru_cache(maxsize=65536)
+def _stem(word: str) -> str:
+    """Crude suffix stripping so plural and verb forms of a word compare equal."""
+    for suffix in ("ies", "ing", "es", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized content words of a text: lowercased, punctuation and stopwords removed, stemmed."""
+    return [_stem(word) for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+
+
+def query_terms(query: str) -> FrozenSet[str]:
+    """Set of normalized content words of a query."""
+    return frozenset(tokenize(query))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class _Search:
+    query: str
+    terms: FrozenSet[str]
+    max_results: int
+    search_depth: str
+    include_raw_content: bool
+    future: "asyncio.Future[Dict]"
+
+    def covers(self, max_results: int, search_depth: str, include_raw_content: bool) -> bool:
+        """Whether this search's results can stand in for a request with these parameters."""
+        return (
+            self.max_results >= max_results
+            and (self.search_depth == search_depth or self.search_depth == "advanced")
+            and (self.include_raw_content or not include_raw_content)
+        )
+
+
+class QueryRegistry:
+    """Searches made during one run, so later near-duplicate queries reuse their results."""
+
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = QUERY_DEDUP_THRESHOLD if threshold is None else threshold
+        self.searches: List[_Search] = []
+        self.requested = 0
+        self.failed = 0
+        self.collapsed: Dict[str, str] = {}
+
+    def _find(self, terms: FrozenSet[str], max_results: int, search_depth: str,
+              include_raw_content: bool) -> Optional[_Search]:
+        best, best_score = None, 0.0
+        loop = asyncio.get_running_loop()
+        for search in self.searches:
+            # Searches from an earlier event loop (e.g. a previous asyncio.run) cannot be awaited
+            if search.future.get_loop() is not loop or not search.covers(max_results, search_depth, include_raw_content):
+                continue
+            score = 1.0 if search.terms == terms else jaccard(search.terms, terms)
+            if score >= self.threshold and score > best_score:
+                best, best_score = search, score
+        return best
+
+    async def search(
+        self,
+        query: str,
+        fetch: Callable[[], Awaitable[Dict]],
+        max_results: int,
+        search_depth: str,
+        include_raw_content: bool
+    ) -> Dict:
+        """
+        Return the results of an earlier equivalent search of this run (waiting for it if it is still
+        in flight), or run fetch() and register it for later requesters.
+        """
+        self.requested += 1
+        terms = query_terms(query)
+        existing = self._find(terms, max_results, search_depth, include_raw_content)
+        if existing is not None:
+            if existing.query != query:
+                self.collapsed[query] = existing.query
+            results = await asyncio.shield(existing.future)
+            return {**results, "results": results.get("results", [])[:max_results]}
+
+        future = asyncio.get_running_loop().create_future()
+        entry = _Search(query, terms, max_results, search_depth, include_raw_content, future)
+        self.searches.append(entry)
+        try:
+            results = await fetch()
+        except BaseException as e:
+            # Forget the failed search so later requesters try again
+            self.searches.remove(entry)
+            self.failed += 1
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark the exception as retrieved when nobody else was waiting for it
+                future.exception()
+            raise
+        future.set_result(results)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Requested and executed searches, and which queries were answered by another query's results."""
+        return {
+            "requested": self.requested,
+            "searched": len(self.searches),
+            "failed": self.failed,
+            "saved": self.requested - len(self.searches) - self.failed,
+            "collapsed": dict(self.collapsed),
+        }
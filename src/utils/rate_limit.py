@@ -0,0 +1,188 @@
+"""
+Rate limiting, retry and backoff for calls to external APIs (OpenAI, Tavily).
+"""
+import asyncio
+import math
+import random
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rps` requests per second (bursts up to `burst`),
+    combined with a cap of `max_concurrency` requests in flight.
+    Use as `async with limiter:` around one request.
+    """
+
+    def __init__(self, rps: float, max_concurrency: int, burst: Optional[int] = None):
+        self.rps = rps
+        self.capacity = burst or max(1, math.ceil(rps))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.wait_time = 0.0
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _take_token(self) -> None:
+        if self.rps <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rps)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rps)
+
+    async def __aenter__(self) -> "RateLimiter":
+        start = time.monotonic()
+        await self._semaphore.acquire()
+        try:
+            await self._take_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        self.requests += 1
+        self.wait_time += time.monotonic() - start
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._semaphore.release()
+
+
+# Limiters are bound to the event loop they were created in, so keep one set per loop
+_limiters = weakref.WeakKeyDictionary()
+
+
+def get_rate_limiter(provider: str, rps: float, max_concurrency: int, burst: Optional[int] = None) -> RateLimiter:
+    """Get the rate limiter of a provider for the running event loop, creating it if needed."""
+    loop = asyncio.get_running_loop()
+    limiters = _limiters.setdefault(loop, {})
+    if provider not in limiters:
+        limiters[provider] = RateLimiter(rps, max_concurrency, burst)
+    return limiters[provider]
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff: the n-th retry waits up to base_delay * 2**(n-1), capped at max_delay."""
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, retry: int) -> float:
+        """Full-jitter delay before the given retry (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    """
+    Find the HTTP status of an error raised by the openai or httpx clients (TavilyClient raises
+    httpx.HTTPStatusError), or an aiohttp ClientResponseError.
+    """
+    for candidate in (exc, getattr(exc, "response", None)):
+        status = getattr(candidate, "status_code", None) or getattr(candidate, "status", None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether an error is worth retrying: rate limits, server errors, timeouts and connection failures."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # Connection and timeout errors of the openai and aiohttp clients carry no status code
+    name = type(exc).__name__
+    return name in {"APIConnectionError", "APITimeoutError", "ClientConnectionError",
+                    "ServerDisconnectedError", "ClientOSError", "ConnectError", "ReadTimeout"}
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Delay requested by the server through a Retry-After header, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryStats:
+    """Per-call retry accounting for one run, grouped by provider."""
+
+    def __init__(self):
+        self.calls: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def record(self, provider: str, key: str, attempts: int, error: Optional[BaseException] = None) -> None:
+        """Record a finished call (successful or not) and how many attempts it took."""
+        calls = self.calls.setdefault(provider, {})
+        entry = calls.setdefault(key, {"calls": 0, "attempts": 0, "failures": 0, "last_error": None})
+        entry["calls"] += 1
+        entry["attempts"] += attempts
+        if error is not None:
+            entry["failures"] += 1
+            entry["last_error"] = f"{type(error).__name__}: {error}"
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals per provider, plus the individual calls that needed a retry or failed."""
+        summary = {}
+        for provider, calls in self.calls.items():
+            summary[provider] = {
+                "calls": sum(e["calls"] for e in calls.values()),
+                "retries": sum(e["attempts"] - e["calls"] for e in calls.values()),
+                "failures": sum(e["failures"] for e in calls.values()),
+                "retried_or_failed": {
+                    key: e for key, e in calls.items()
+                    if e["attempts"] > e["calls"] or e["failures"]
+                },
+            }
+        return summary
+
+
+async def retry_async(
+    fn: Callable[[], Awaitable[Any]],
+    policy: RetryPolicy,
+    limiter: Optional[RateLimiter] = None,
+    stats: Optional[RetryStats] = None,
+    provider: str = "",
+    key: str = ""
+) -> Any:
+    """
+    Await fn(), retrying retryable errors with jittered exponential backoff.
+    Each attempt goes through `limiter`, and the outcome is recorded in `stats` under provider/key.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            if limiter is not None:
+                async with limiter:
+                    result = await fn()
+            else:
+                result = await fn()
+        except Exception as e:
+            if attempt >= policy.max_attempts or not is_retryable(e):
+                if stats is not None:
+                    stats.record(provider, key, attempt, e)
+                raise
+            delay = _retry_after(e) or policy.delay(attempt)
+            print(f"Retrying {provider} call '{key[:60]}' in {delay:.1f}s after error: {e}")
+            await asyncio.sleep(delay)
+            continue
+
+        if stats is not None:
+            stats.record(provider, key, attempt)
+        return result
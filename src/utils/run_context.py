@@ -0,0 +1,78 @@
+"""
+Per-run state shared by every node of one research run.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+from src.utils.document_store import DocumentStore
+from src.utils.manifest import Regeneration, RunManifest
+from src.utils.metrics import RunMetrics
+from src.utils.query_registry import QueryRegistry
+from src.utils.rate_limit import RetryStats
+from src.utils.section_tracker import SectionTracker
+from src.utils.speculation import Speculation
+from src.utils.token_budget import TokenBudget
+
+
+@dataclass
+class RunContext:
+    """Shared resources for a single run of the research workflow."""
+    document_store: DocumentStore = field(default_factory=DocumentStore)
+    retries: RetryStats = field(default_factory=RetryStats)
+    metrics: RunMetrics = field(default_factory=RunMetrics)
+    sections: SectionTracker = field(default_factory=SectionTracker)
+    queries: QueryRegistry = field(default_factory=QueryRegistry)
+    # Adaptive search depth decision per section (and for the report plan)
+    search_decisions: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Section research started while the report plan was being generated
+    speculation: Speculation = field(default_factory=Speculation)
+    # Plan, queries, fingerprints and contents of the sections written in this run
+    manifest: RunManifest = field(default_factory=RunManifest)
+    # Previous run this one regenerates incrementally, if any
+    regeneration: Optional[Regeneration] = None
+    # Token budget and deadline of the run, allocated to its sections
+    budget: TokenBudget = field(default_factory=TokenBudget.from_env)
+
+    def summary(self) -> Dict[str, Any]:
+        """Statistics collected during the run."""
+        return {
+            "documents": self.document_store.stats(),
+            "retries": self.retries.summary(),
+            "queries": self.queries.stats(),
+            "search_decisions": self.search_decisions,
+            "speculation": self.speculation.stats(),
+            "regeneration": self.regeneration.stats() if self.regeneration is not None else {},
+            "budget": self.budget.stats(),
+            "metrics": self.metrics.summary(),
+        }
+
+
+# The context is carried by a ContextVar, which LangGraph copies into every node task
+_current_run: ContextVar[Optional[RunContext]] = ContextVar("current_run", default=None)
+
+# Fallback used when nodes are called outside of run_context(), e.g. from a notebook
+_default_run = None
+
+
+def get_run_context() -> RunContext:
+    """Get the context of the current run."""
+    global _default_run
+    run = _current_run.get()
+    if run is None:
+        if _default_run is None:
+            _default_run = RunContext()
+        run = _default_run
+    return run
+
+
+@contextmanager
+def run_context(run: Optional[RunContext] = None) -> Iterator[RunContext]:
+    """Make `run` (or a fresh RunContext) the current run for the duration of the block."""
+    run = run or RunContext()
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
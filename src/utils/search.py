@@ -2,9 +2,60 @@
 Search utilities for web research functionality.
 """
 import asyncio
+import os
 from dataclasses import asdict, dataclass
-from typing import List, Dict, Union, Any
-from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+from typing import List, Dict, Optional, Tuple, Union, Any
+
+from src.utils.cache import DiskCache, make_cache_key
+from src.utils.metrics import trace
+from src.utils.passage_index import PassageIndex
+from src.utils.rate_limit import RateLimiter, RetryPolicy, get_rate_limiter, retry_async
+from src.utils.http import get_http_client
+from src.utils.run_context import get_run_context
+
+
+# Search cache settings
+# SEARCH_CACHE_MODE: "on" (read and write), "refresh" (skip reads, store fresh results) or "off" (bypass)
+SEARCH_CACHE_MODE = os.getenv("SEARCH_CACHE_MODE", "on")
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search_cache.sqlite")
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SEARCH_CACHE_MAX_MB = float(os.getenv("SEARCH_CACHE_MAX_MB", "512"))
+
+# Local passage index of every fetched page, shared by all runs
+# PASSAGE_INDEX_MODE: "on" (answer queries from the index, search Tavily only for the gaps, index new pages),
+# "build" (only index new pages) or "off"
+PASSAGE_INDEX_MODE = os.getenv("PASSAGE_INDEX_MODE", "off")
+PASSAGE_INDEX_PATH = os.getenv("PASSAGE_INDEX_PATH", ".cache/passage_index.sqlite")
+# Share of a query's terms the passages of a stored page must contain for the page to answer the query
+PASSAGE_INDEX_MIN_COVERAGE = float(os.getenv("PASSAGE_INDEX_MIN_COVERAGE", "0.6"))
+PASSAGE_INDEX_MAX_MB = float(os.getenv("PASSAGE_INDEX_MAX_MB", "1024"))
+
+# Maximum number of Tavily searches in flight at once, across all sections and runs in the process
+SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "16"))
+# Sustained Tavily requests per second (0 disables the rate limit)
+SEARCH_RPS = float(os.getenv("SEARCH_RPS", "10"))
+# Attempts per search, retrying rate limits, server errors and timeouts with jittered backoff
+SEARCH_MAX_ATTEMPTS = int(os.getenv("SEARCH_MAX_ATTEMPTS", "4"))
+
+SEARCH_RETRY_POLICY = RetryPolicy(max_attempts=SEARCH_MAX_ATTEMPTS)
+
+# Tavily API endpoint, e.g. a local stand-in server for testing
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")
+
+# Search depth: "advanced" searches every query at advanced depth with the full result count;
+# "adaptive" starts with basic depth and ADAPTIVE_INITIAL_RESULTS results per query, and repeats
+# the queries at advanced depth with the full result count only when the first pass found too
+# few new pages: fewer than ADAPTIVE_MIN_NEW_SOURCES URLs not seen earlier in the run, or new URLs
+# making up less than ADAPTIVE_NOVELTY_THRESHOLD of the results
+SEARCH_DEPTH_MODE = os.getenv("SEARCH_DEPTH_MODE", "advanced")
+ADAPTIVE_INITIAL_RESULTS = int(os.getenv("ADAPTIVE_INITIAL_RESULTS", "3"))
+ADAPTIVE_NOVELTY_THRESHOLD = float(os.getenv("ADAPTIVE_NOVELTY_THRESHOLD", "0.5"))
+ADAPTIVE_MIN_NEW_SOURCES = int(os.getenv("ADAPTIVE_MIN_NEW_SOURCES", "8"))
+
+
+def get_search_limiter() -> RateLimiter:
+    """Get the Tavily rate limiter for the running event loop."""
+    return get_rate_limiter("tavily", SEARCH_RPS, SEARCH_MAX_CONCURRENCY)
 
 
 @dataclass
@@ -16,28 +67,209 @@ class SearchQuery:
         return asdict(self)
 
 
-# Initialize Tavily search wrapper lazily to avoid API key validation at import time
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups: lowercase and collapse whitespace."""
+    return " ".join(query.lower().split())
+
+
+class TavilyClient:
+    """
+    Tavily Search API client on the shared HTTP connection pool, with the raw_results_async
+    interface of langchain's TavilySearchAPIWrapper (which opens a new session for every call).
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        self.api_key = api_key or os.getenv("TAVILY_API_KEY")
+        self.base_url = (base_url or TAVILY_BASE_URL).rstrip("/")
+
+    async def raw_results_async(
+        self,
+        query: str,
+        max_results: int = 5,
+        search_depth: str = "advanced",
+        include_domains: Optional[List[str]] = None,
+        exclude_domains: Optional[List[str]] = None,
+        include_answer: bool = False,
+        include_raw_content: bool = False,
+        include_images: bool = False
+    ) -> Dict:
+        """Get results from the Tavily Search API; HTTP errors raise httpx.HTTPStatusError."""
+        response = await get_http_client().post(f"{self.base_url}/search", json={
+            "api_key": self.api_key,
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_domains": include_domains or [],
+            "exclude_domains": exclude_domains or [],
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+            "include_images": include_images,
+        })
+        response.raise_for_status()
+        return response.json()
+
+
+class CachedTavilySearch:
+    """
+    Drop-in wrapper around TavilyClient.raw_results_async that serves repeated
+    searches from the on-disk cache, keyed on the normalized query and the search parameters.
+    """
+
+    def __init__(self, client: "TavilyClient", cache: DiskCache, mode: str = "on"):
+        self.client = client
+        self.cache = cache
+        self.mode = mode
+
+    async def raw_results_async(
+        self,
+        query: str,
+        max_results: int = 5,
+        search_depth: str = "advanced",
+        include_answer: bool = False,
+        include_raw_content: bool = False,
+        **kwargs
+    ) -> Dict:
+        """Get results from the cache, falling back to the Tavily Search API."""
+        with trace("tavily", "search", query=query, search_depth=search_depth, max_results=max_results) as span:
+            results, cached = await self._cached_search(
+                query=query,
+                max_results=max_results,
+                search_depth=search_depth,
+                include_answer=include_answer,
+                include_raw_content=include_raw_content,
+                **kwargs
+            )
+            span.attributes["cached"] = cached
+            span.attributes["results"] = len(results.get("results", []))
+        return results
+
+    async def _cached_search(
+        self,
+        query: str,
+        max_results: int,
+        search_depth: str,
+        include_answer: bool,
+        include_raw_content: bool,
+        **kwargs
+    ) -> Tuple[Dict, bool]:
+        """Return the search results and whether they came from the cache."""
+        if self.mode == "off":
+            return await self._search(
+                query=query,
+                max_results=max_results,
+                search_depth=search_depth,
+                include_answer=include_answer,
+                include_raw_content=include_raw_content,
+                **kwargs
+            ), False
+
+        key = make_cache_key(
+            normalize_query(query), max_results, search_depth, include_answer, include_raw_content, kwargs
+        )
+        if self.mode != "refresh":
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached, True
+
+        results = await self._search(
+            query=query,
+            max_results=max_results,
+            search_depth=search_depth,
+            include_answer=include_answer,
+            include_raw_content=include_raw_content,
+            **kwargs
+        )
+        await asyncio.to_thread(self.cache.set, key, results)
+        return results, False
+
+    async def _search(self, **kwargs) -> Dict:
+        """
+        Call the Tavily API through the shared rate limiter (SEARCH_RPS, SEARCH_MAX_CONCURRENCY),
+        retrying retryable errors; retries are recorded in the run statistics per query.
+        """
+        return await retry_async(
+            lambda: self.client.raw_results_async(**kwargs),
+            SEARCH_RETRY_POLICY,
+            limiter=get_search_limiter(),
+            stats=get_run_context().retries,
+            provider="tavily",
+            key=kwargs["query"]
+        )
+
+
+# Initialize search cache, passage index and Tavily search wrapper lazily to avoid API key validation at import time
+search_cache = None
+passage_index = None
 tavily_search = None
 
+def get_search_cache() -> DiskCache:
+    """Get the on-disk search cache, initializing it if needed."""
+    global search_cache
+    if search_cache is None:
+        search_cache = DiskCache(
+            SEARCH_CACHE_PATH,
+            namespace="tavily",
+            ttl_seconds=SEARCH_CACHE_TTL_SECONDS,
+            max_bytes=int(SEARCH_CACHE_MAX_MB * 1024 * 1024)
+        )
+    return search_cache
+
+def get_passage_index() -> PassageIndex:
+    """Get the local passage index, initializing it if needed."""
+    global passage_index
+    if passage_index is None:
+        passage_index = PassageIndex(
+            PASSAGE_INDEX_PATH,
+            min_term_coverage=PASSAGE_INDEX_MIN_COVERAGE,
+            max_bytes=int(PASSAGE_INDEX_MAX_MB * 1024 * 1024)
+        )
+    return passage_index
+
 def get_tavily_search():
     """Get Tavily search wrapper, initializing it if needed."""
     global tavily_search
     if tavily_search is None:
-        tavily_search = TavilySearchAPIWrapper()
+        tavily_search = CachedTavilySearch(TavilyClient(), get_search_cache(), mode=SEARCH_CACHE_MODE)
     return tavily_search
 
 
 async def run_search_queries(
     search_queries: List[Union[str, SearchQuery]],
     num_results: int = 5,
-    include_raw_content: bool = False
+    include_raw_content: bool = False,
+    search_depth: str = "advanced"
 ) -> List[Dict]:
     """
     Asynchronously run tavily search queries for specific list of queries and return back the search results.
     This is async so it is non blocking and can be executed in parallel.
+    Queries that duplicate or nearly duplicate an earlier query of the run (see QueryRegistry) reuse its results,
+    and with PASSAGE_INDEX_MODE=on queries the local passage index can answer do not reach Tavily.
     """
+    run = get_run_context()
     search_tasks = []
 
+    async def fetch(query_str: str) -> Dict:
+        results = None
+        if PASSAGE_INDEX_MODE == "on":
+            with trace("passage_index", "search", query=query_str) as span:
+                results = await asyncio.to_thread(
+                    get_passage_index().lookup, query_str, num_results, include_raw_content
+                )
+                span.attributes["answered"] = results is not None
+        if results is None:
+            results = await get_tavily_search().raw_results_async(
+                query=query_str,
+                max_results=num_results,
+                search_depth=search_depth,
+                include_answer=False,
+                include_raw_content=include_raw_content
+            )
+            if PASSAGE_INDEX_MODE != "off":
+                await asyncio.to_thread(get_passage_index().add_results, results)
+        # Share one copy of each page across the planner and all sections of this run
+        run.document_store.add_search_results([results])
+        return results
+
     for query in search_queries:
         # Handle both string and SearchQuery objects
         # Just in case LLM fails to generate queries as:
@@ -48,11 +280,11 @@ async def run_search_queries(
         try:
             # get results from tavily asynchronously (in parallel) for each search query
             search_tasks.append(
-                get_tavily_search().raw_results_async(
-                    query=query_str,
+                run.queries.search(
+                    query_str,
+                    lambda query_str=query_str: fetch(query_str),
                     max_results=num_results,
-                    search_depth='advanced',
-                    include_answer=False,
+                    search_depth=search_depth,
                     include_raw_content=include_raw_content
                 )
             )
@@ -65,12 +297,64 @@ async def run_search_queries(
         if not search_tasks:
             return []
         search_docs = await asyncio.gather(*search_tasks, return_exceptions=True)
-        # Filter out any exceptions from the results
-        valid_results = [
-            doc for doc in search_docs
-            if not isinstance(doc, Exception)
-        ]
+        # Filter out any exceptions from the results, they are already counted in the run's retry statistics
+        valid_results = []
+        for doc in search_docs:
+            if isinstance(doc, Exception):
+                print(f"Search failed after retries: {doc}")
+            else:
+                valid_results.append(doc)
         return valid_results
     except Exception as e:
         print(f"Error during search queries: {e}")
         return []
+
+
+async def run_adaptive_search_queries(
+    search_queries: List[Union[str, SearchQuery]],
+    num_results: int = 5,
+    include_raw_content: bool = False,
+    label: str = "search"
+) -> List[Dict]:
+    """
+    Run the queries with run_search_queries at the depth chosen by SEARCH_DEPTH_MODE.
+    In adaptive mode the escalation decision is recorded in the run statistics under `label`
+    (the section name or the report plan).
+    """
+    if SEARCH_DEPTH_MODE != "adaptive":
+        return await run_search_queries(search_queries, num_results, include_raw_content)
+
+    run = get_run_context()
+    known_urls = set(run.document_store.documents)
+    initial_results = min(ADAPTIVE_INITIAL_RESULTS, num_results)
+
+    with trace(label, "adaptive_search") as span:
+        search_docs = await run_search_queries(
+            search_queries, initial_results, include_raw_content, search_depth="basic"
+        )
+        urls = [
+            result["url"]
+            for response in search_docs
+            for result in response.get("results", [])
+            if isinstance(result, dict) and "url" in result
+        ]
+        new_urls = set(urls) - known_urls
+        novelty = len(new_urls) / len(urls) if urls else 0.0
+        escalated = novelty < ADAPTIVE_NOVELTY_THRESHOLD or len(new_urls) < ADAPTIVE_MIN_NEW_SOURCES
+
+        if escalated:
+            print(f"--- Escalating search for {label}: {len(new_urls)} new of {len(urls)} results ---")
+            search_docs = search_docs + await run_search_queries(
+                search_queries, num_results, include_raw_content, search_depth="advanced"
+            )
+
+        decision = {
+            "queries": len(search_queries),
+            "initial_results": len(urls),
+            "new_urls": len(new_urls),
+            "novelty": round(novelty, 3),
+            "escalated": escalated,
+        }
+        span.attributes.update(decision)
+        run.search_decisions[label] = decision
+    return search_docs
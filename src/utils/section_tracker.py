@@ -0,0 +1,36 @@
+"""
+Completion tracking for the sections of one run, so a final section can start as soon as the
+research sections it depends on are written instead of waiting for all of them.
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from src.models.schemas import Section
+
+
+class SectionTracker:
+    """Completed research sections of a run and their digests, with an event per section name to wait on."""
+
+    def __init__(self):
+        self.completed: Dict[str, Section] = {}
+        self.digests: Dict[str, str] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+
+    def _event(self, name: str) -> asyncio.Event:
+        if name not in self._events:
+            self._events[name] = asyncio.Event()
+        return self._events[name]
+
+    def complete(self, section: Section, digest: Optional[str] = None) -> None:
+        """Record a written section (and its digest) and wake up everything waiting for it."""
+        self.completed[section.name] = section
+        if digest is not None:
+            self.digests[section.name] = digest
+        self._event(section.name).set()
+
+    async def wait_for(self, names: Iterable[str]) -> List[Section]:
+        """Wait until all the named sections are written and return them in the given order."""
+        names = list(names)
+        for name in names:
+            await self._event(name).wait()
+        return [self.completed[name] for name in names]
@@ -0,0 +1,116 @@
+"""
+Bookkeeping for speculative section research, started while the report plan is still being generated.
+
+Each candidate is a probable section topic whose query generation and searches run as a task.
+Once the plan is known, candidates are matched to its research sections: a matched candidate's
+queries and results are handed to that section, and the others are cancelled and counted as waste.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from src.models.schemas import SearchQuery, Section
+from src.utils.query_registry import query_terms
+
+
+@dataclass
+class Candidate:
+    """A probable section and the research started for it."""
+    topic: str
+    terms: FrozenSet[str]
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+    task: Optional["asyncio.Task[Tuple[List[SearchQuery], List[Dict]]]"] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Searches completed (cancelled candidates may have spent more)
+    searches: int = 0
+    section: Optional[str] = None
+    cancelled: bool = False
+
+    def coverage(self, section: Section) -> float:
+        """Share of the candidate's terms found in the section's name and description."""
+        if not self.terms:
+            return 0.0
+        return len(self.terms & query_terms(f"{section.name} {section.description}")) / len(self.terms)
+
+
+class Speculation:
+    """Speculative research of one run: candidates, the sections they were matched to, and what it saved and cost."""
+
+    def __init__(self):
+        self.candidates: List[Candidate] = []
+        self.kept: Dict[str, Candidate] = {}
+        self.plan_ready: Optional[float] = None
+
+    def add(self, topic: str) -> Candidate:
+        candidate = Candidate(topic, query_terms(topic))
+        self.candidates.append(candidate)
+        return candidate
+
+    def resolve(self, sections: List[Section], threshold: float) -> None:
+        """
+        Match candidates to research sections, best coverage first, one candidate per section,
+        and cancel the candidates no section matched.
+        """
+        self.plan_ready = time.perf_counter()
+        pairs = sorted(
+            ((candidate.coverage(section), i, candidate, section)
+             for i, candidate in enumerate(self.candidates)
+             for section in sections if section.research),
+            key=lambda pair: (-pair[0], pair[1])
+        )
+        for score, _, candidate, section in pairs:
+            if score < threshold or candidate.section is not None or section.name in self.kept:
+                continue
+            candidate.section = section.name
+            self.kept[section.name] = candidate
+        for candidate in self.candidates:
+            if candidate.section is None and candidate.task is not None:
+                candidate.cancelled = not candidate.task.done()
+                candidate.task.cancel()
+
+    async def take(self, section_name: str) -> Optional[Tuple[List[SearchQuery], List[Dict]]]:
+        """The queries and search results of the candidate kept for a section, or None to research it normally."""
+        candidate = self.kept.get(section_name)
+        if candidate is None or candidate.task is None:
+            return None
+        try:
+            return await asyncio.shield(candidate.task)
+        except Exception as e:
+            print(f"Speculative research for {section_name} failed, researching it normally: {e}")
+            self.kept.pop(section_name, None)
+            return None
+
+    def cancel(self) -> None:
+        """Cancel every unfinished candidate, e.g. when the plan failed."""
+        for candidate in self.candidates:
+            if candidate.task is not None:
+                candidate.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Wall time saved per kept section (research done before the plan was ready) and the LLM
+        tokens and completed searches spent on discarded candidates; `cancelled` of them were
+        stopped in flight.
+        """
+        if not self.candidates:
+            return {}
+        plan_ready = self.plan_ready or time.perf_counter()
+        saved = {
+            name: round(max(0.0, min(candidate.finished or plan_ready, plan_ready) - candidate.started), 3)
+            for name, candidate in self.kept.items()
+        }
+        discarded = [candidate for candidate in self.candidates if candidate.section is None]
+        return {
+            "candidates": len(self.candidates),
+            "kept": {name: candidate.topic for name, candidate in self.kept.items()},
+            "discarded": [candidate.topic for candidate in discarded],
+            "cancelled": sum(candidate.cancelled for candidate in discarded),
+            "saved_s": saved,
+            "max_saved_s": max(saved.values(), default=0.0),
+            "wasted_input_tokens": sum(candidate.input_tokens for candidate in discarded),
+            "wasted_output_tokens": sum(candidate.output_tokens for candidate in discarded),
+            "wasted_searches": sum(candidate.searches for candidate in discarded),
+        }
@@ -0,0 +1,198 @@
+"""
+Run-wide token budget and deadline.
+
+The caller caps the input and output tokens a run may spend and the seconds it may take. Once the
+plan is known, every section to be written holds a share of what is left, weighted by the context
+it would use without a budget; a section is allocated its context size, raw-content cap per source
+and max_tokens when it starts, and its share is released when it is written. As the budget drains
+(or the deadline nears) the allocations shrink: less context, smaller raw-content caps, then search
+snippets instead of page content. A section whose allocation falls below the minimum, or that starts
+after the deadline, is not written and gets a short placeholder instead, which is not recorded in
+the run manifest.
+
+Every LLM call of the run is charged to the budget, so the accounting in the run statistics covers
+planning, query generation and digests as well as the sections.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Run-wide caps on LLM input and output tokens and on the run's duration in seconds; 0 means unlimited
+RUN_MAX_INPUT_TOKENS = int(os.getenv("RUN_MAX_INPUT_TOKENS", "0"))
+RUN_MAX_OUTPUT_TOKENS = int(os.getenv("RUN_MAX_OUTPUT_TOKENS", "0"))
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "0"))
+# Under a budget, sections allocated less context or fewer output tokens than this are not written
+BUDGET_MIN_CONTEXT_TOKENS = int(os.getenv("BUDGET_MIN_CONTEXT_TOKENS", "1000"))
+BUDGET_MIN_OUTPUT_TOKENS = int(os.getenv("BUDGET_MIN_OUTPUT_TOKENS", "200"))
+# Under a budget, sections allocated less context than this get search snippets instead of page content
+BUDGET_MIN_RAW_CONTEXT_TOKENS = int(os.getenv("BUDGET_MIN_RAW_CONTEXT_TOKENS", "4000"))
+
+# Raw-content cap per source below which budgeted sections are not shrunk further
+MIN_SOURCE_TOKENS = 500
+# Tokens of a section prompt besides its context (instructions, title, description); the writer
+# templates are about 450
+PROMPT_TOKENS = 500
+
+
+def unwritten_section(name: str, reason: str) -> str:
+    """Placeholder content of a section the budget did not allow to be written."""
+    return f"## {name}\n\n*Not written: {reason}.*"
+
+
+@dataclass
+class Allocation:
+    """What one section may spend: its context size, raw-content cap per source and max_tokens."""
+    context_tokens: int
+    source_tokens: int
+    max_output_tokens: Optional[int] = None
+    raw_content: bool = True
+    # Why the section is not written, e.g. "deadline passed", empty when it is
+    refused: str = ""
+    degraded: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "context_tokens": self.context_tokens,
+            "source_tokens": self.source_tokens,
+            "max_output_tokens": self.max_output_tokens,
+            "raw_content": self.raw_content,
+            "refused": self.refused,
+            "degraded": self.degraded,
+        }
+
+    def fingerprint_part(self) -> Optional[Dict[str, Any]]:
+        """
+        What the budget limited about the section, part of its fingerprint so an incremental run
+        does not reuse content written under a budget; None when the budget limited nothing.
+        """
+        if not (self.degraded or self.refused or self.max_output_tokens is not None):
+            return None
+        return self.to_dict()
+
+
+@dataclass
+class TokenBudget:
+    """Input/output token budget and deadline of one run, shared out to its sections as they start."""
+    max_input_tokens: Optional[int] = None
+    max_output_tokens: Optional[int] = None
+    deadline_s: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    allocations: Dict[str, Allocation] = field(default_factory=dict)
+    # Sections not allocated yet and the context tokens each would use without a budget
+    pending: Dict[str, int] = field(default_factory=dict)
+    # Input and output tokens held by sections allocated but not written yet
+    reserved: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> "TokenBudget":
+        """The budget set by RUN_MAX_INPUT_TOKENS, RUN_MAX_OUTPUT_TOKENS and RUN_DEADLINE_SECONDS."""
+        return cls(RUN_MAX_INPUT_TOKENS or None, RUN_MAX_OUTPUT_TOKENS or None, RUN_DEADLINE_SECONDS or None)
+
+    @property
+    def limited(self) -> bool:
+        return any(limit is not None for limit in (self.max_input_tokens, self.max_output_tokens, self.deadline_s))
+
+    def start(self) -> None:
+        """Start the deadline clock, at the start of the run."""
+        self.started = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def plan(self, sections: Dict[str, int]) -> None:
+        """Register the sections to be written, with the context tokens each would use without a budget."""
+        self.pending = dict(sections)
+
+    def charge(self, input_tokens: int, output_tokens: int) -> None:
+        """Account for the tokens of one LLM call."""
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+
+    def _left(self, limit: Optional[int], spent: int, index: int) -> Optional[int]:
+        if limit is None:
+            return None
+        return limit - spent - sum(held[index] for held in self.reserved.values())
+
+    def allocate(self, name: str, context_tokens: int, source_tokens: int = 0) -> Allocation:
+        """
+        Allocate a section its context (at most `context_tokens`), raw-content cap per source (at most
+        `source_tokens`) and max_tokens from what is left of the budget, in proportion to the context
+        it and the sections still to come would use without a budget. The prompt of every section
+        still to come is set aside first, since it does not shrink with the context.
+        """
+        if name in self.allocations:
+            return self.allocations[name]
+        weight = self.pending.pop(name, context_tokens)
+        if not self.limited:
+            allocation = Allocation(context_tokens, source_tokens)
+            self.allocations[name] = allocation
+            return allocation
+
+        # Share of what is left, and how far the budget and the deadline have drained
+        pending_weight = weight + sum(self.pending.values())
+        drained = 1.0
+        input_left = self._left(self.max_input_tokens, self.input_tokens, 0)
+        output_left = self._left(self.max_output_tokens, self.output_tokens, 1)
+        context = context_tokens
+        if input_left is not None:
+            shared = input_left - PROMPT_TOKENS * (len(self.pending) + 1)
+            context = min(context, int(max(0, shared) * weight / max(1, pending_weight)))
+            drained = min(drained, max(0, input_left) / self.max_input_tokens)
+        if self.deadline_s is not None:
+            drained = min(drained, max(0.0, 1 - self.elapsed() / self.deadline_s))
+        max_output = None
+        if output_left is not None:
+            max_output = max(0, output_left) // (len(self.pending) + 1)
+
+        refused = ""
+        if self.deadline_s is not None and self.elapsed() >= self.deadline_s:
+            refused = "deadline passed"
+        elif context < min(context_tokens, BUDGET_MIN_CONTEXT_TOKENS):
+            refused = "input token budget spent"
+        elif max_output is not None and max_output < BUDGET_MIN_OUTPUT_TOKENS:
+            refused = "output token budget spent"
+
+        source = max(min(MIN_SOURCE_TOKENS, source_tokens), int(source_tokens * drained))
+        allocation = Allocation(
+            context_tokens=max(0, context),
+            source_tokens=source,
+            max_output_tokens=max_output,
+            raw_content=context >= min(context_tokens, BUDGET_MIN_RAW_CONTEXT_TOKENS),
+            refused=refused,
+            degraded=context < context_tokens or source < source_tokens,
+        )
+        self.allocations[name] = allocation
+        if not refused:
+            self.reserved[name] = (allocation.context_tokens + PROMPT_TOKENS, max_output or 0)
+        return allocation
+
+    def allocation(self, name: str) -> Optional[Allocation]:
+        return self.allocations.get(name)
+
+    def settle(self, name: str) -> None:
+        """Release what a written section held back; its actual tokens were charged by its LLM call."""
+        self.reserved.pop(name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Limits, tokens spent, and each section's allocation with the sections degraded or not written."""
+        refused: List[str] = sorted(name for name, a in self.allocations.items() if a.refused)
+        return {
+            "max_input_tokens": self.max_input_tokens,
+            "max_output_tokens": self.max_output_tokens,
+            "deadline_s": self.deadline_s,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "elapsed_s": round(self.elapsed(), 3),
+            "within_budget": (
+                (self.max_input_tokens is None or self.input_tokens <= self.max_input_tokens)
+                and (self.max_output_tokens is None or self.output_tokens <= self.max_output_tokens)
+                and (self.deadline_s is None or self.elapsed() <= self.deadline_s)
+            ),
+            "degraded": sorted(name for name, a in self.allocations.items() if a.degraded and not a.refused),
+            "refused": refused,
+            "sections": {name: allocation.to_dict() for name, allocation in self.allocations.items()},
+        }
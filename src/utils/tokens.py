@@ -0,0 +1,86 @@
+"""
+Token counting and truncation utilities.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, List, Tuple
+
+
+# Generous upper bound on characters per token used to size the prefix that gets encoded.
+# English web text averages about 4 characters per token.
+CHARS_PER_TOKEN_BOUND = 6
+
+# Threads used to encode several pages at once (tiktoken releases the GIL while encoding)
+ENCODE_THREADS = 8
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str = "gpt-4") -> Any:
+    """Get the tiktoken encoding for a model, importing tiktoken and loading it only once per process."""
+    import tiktoken
+
+    return tiktoken.encoding_for_model(model_name)
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in text."""
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def _prefix_length(max_tokens: int) -> int:
+    return max_tokens * CHARS_PER_TOKEN_BOUND + 64
+
+
+def _cut(encoding: Any, text: str, prefix: str, tokens: List[int], max_tokens: int) -> Tuple[str, int] | None:
+    """
+    Cut the encoding of `prefix` to max_tokens tokens.
+    Returns None when the result could differ from truncating the full text, which happens if
+    the prefix was too short or the kept tokens reach into the word that was split by the cut.
+    """
+    if len(prefix) == len(text):
+        kept = tokens[:max_tokens]
+        return encoding.decode(kept), len(kept)
+    if len(tokens) <= max_tokens:
+        return None
+    truncated = encoding.decode(tokens[:max_tokens])
+    # Tokens never span whitespace boundaries, so everything before the last one is stable
+    last_boundary = max(prefix.rfind(" "), prefix.rfind("\n"))
+    if len(truncated) >= last_boundary:
+        return None
+    return truncated, max_tokens
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> Tuple[str, int]:
+    """
+    Cut text to its first max_tokens tokens, returning the text and its token count.
+    Only a prefix sized from CHARS_PER_TOKEN_BOUND is encoded, not the whole text.
+    """
+    encoding = get_encoding()
+    length = _prefix_length(max_tokens)
+    while True:
+        prefix = text[:length]
+        result = _cut(encoding, text, prefix, encoding.encode(prefix, disallowed_special=()), max_tokens)
+        if result is not None:
+            return result
+        # Dense text (code, long URLs, non-latin scripts): encode a longer prefix
+        length *= 2
+
+
+def truncate_batch(texts: List[str], max_tokens: int) -> List[Tuple[str, int]]:
+    """Truncate several texts to max_tokens tokens each, encoding their prefixes in parallel."""
+    if not texts:
+        return []
+    encoding = get_encoding()
+    prefixes = [text[:_prefix_length(max_tokens)] for text in texts]
+    encoded = encoding.encode_batch(prefixes, num_threads=ENCODE_THREADS, disallowed_special=())
+
+    results = [
+        _cut(encoding, text, prefix, tokens, max_tokens)
+        for text, prefix, tokens in zip(texts, prefixes, encoded)
+    ]
+    retry = [i for i, result in enumerate(results) if result is None]
+    if retry:
+        with ThreadPoolExecutor(max_workers=min(ENCODE_THREADS, len(retry))) as pool:
+            for i, result in zip(retry, pool.map(lambda i: truncate_to_tokens(texts[i], max_tokens), retry)):
+                results[i] = result
+    return results
@@ -1,6 +1,8 @@
 """
 Main LangGraph workflow for the deep research agent.
 """
+import os
+
 from langgraph.graph import StateGraph, START, END
 from langgraph.constants import Send
 
@@ -11,17 +13,27 @@ from src.models.schemas import (
     Section
 )
 from src.agents.report_planner import generate_report_plan
+from src.agents.query_planner import QUERY_PLANNING, plan_section_queries
 from src.agents.report_compiler import format_completed_sections, compile_final_report
 from src.agents.final_section_writer import write_final_sections
 from src.workflows.section_workflow import create_section_workflow
+from src.utils.metrics import instrument_node
+
+
+# How final (non-research) sections are scheduled:
+# "barrier" writes them once every research section is done,
+# "eager" starts them with the research sections and each waits only for the sections it depends on
+SECTION_SCHEDULING = os.getenv("SECTION_SCHEDULING", "barrier")
 
 
 def parallelize_section_writing(state: ReportState):
     """This is the "map" step when we kick off web research for some sections of the report in parallel and then write the section"""
-    # Kick off section writing in parallel via Send() API for any sections that require research
+    # Kick off section writing in parallel via Send() API for any sections that require research,
+    # with the search queries planned in advance (batched query planning) when there are any
+    planned = state.get("section_queries") or {}
     return [
         Send("section_builder_with_web_search",  # name of the subagent node
-             {"section": s})
+             {"section": s, "search_queries": planned[s.name]} if s.name in planned else {"section": s})
         for s in state["sections"]
         if s.research
     ]
@@ -38,28 +50,76 @@ def parallelize_final_section_writing(state: ReportState):
     ]
 
 
-def create_main_workflow():
-    """Create the main report generation workflow."""
+def final_section_dependencies(section: Section, sections: list[Section]) -> list[str]:
+    """Research sections a final section depends on; all of them unless the plan names a subset."""
+    research_sections = [s.name for s in sections if s.research]
+    declared = [name for name in section.depends_on if name in research_sections]
+    return declared or research_sections
+
+
+def parallelize_all_section_writing(state: ReportState):
+    """
+    Eager scheduling: kick off the research sections and the final sections together.
+    Each final section waits only for the research sections it depends on.
+    """
+    return parallelize_section_writing(state) + [
+        Send("write_final_sections",
+             {"section": s, "depends_on": final_section_dependencies(s, state["sections"])})
+        for s in state["sections"]
+        if not s.research
+    ]
+
+
+def create_main_workflow(checkpointer=None, scheduling: str = None, query_planning: str = None):
+    """
+    Create the main report generation workflow.
+    With a checkpointer, progress is saved after every step so a failed run can be resumed
+    by thread id without recomputing the steps and sections that already completed.
+    `scheduling` ("barrier" or "eager") defaults to SECTION_SCHEDULING, `query_planning`
+    ("section" or "batched") to QUERY_PLANNING.
+    """
+    scheduling = scheduling or SECTION_SCHEDULING
+    if scheduling not in ("barrier", "eager"):
+        raise ValueError(f"Unknown section scheduling '{scheduling}', expected 'barrier' or 'eager'")
+    query_planning = query_planning or QUERY_PLANNING
+    if query_planning not in ("section", "batched"):
+        raise ValueError(f"Unknown query planning '{query_planning}', expected 'section' or 'batched'")
+
     builder = StateGraph(ReportState, input=ReportStateInput, output=ReportStateOutput)
 
     # Get the section builder subagent
     section_builder_subagent = create_section_workflow()
 
-    builder.add_node("generate_report_plan", generate_report_plan)
+    builder.add_node("generate_report_plan", instrument_node("generate_report_plan", generate_report_plan))
     builder.add_node("section_builder_with_web_search", section_builder_subagent)
-    builder.add_node("format_completed_sections", format_completed_sections)
-    builder.add_node("write_final_sections", write_final_sections)
-    builder.add_node("compile_final_report", compile_final_report)
+    builder.add_node("write_final_sections", instrument_node("write_final_sections", write_final_sections))
+    builder.add_node("compile_final_report", instrument_node("compile_final_report", compile_final_report))
 
     builder.add_edge(START, "generate_report_plan")
-    builder.add_conditional_edges("generate_report_plan",
-                                  parallelize_section_writing,
-                                  ["section_builder_with_web_search"])
-    builder.add_edge("section_builder_with_web_search", "format_completed_sections")
-    builder.add_conditional_edges("format_completed_sections",
-                                  parallelize_final_section_writing,
-                                  ["write_final_sections"])
+
+    # The sections are kicked off from the plan, or from the batched query planning that follows it
+    plan_node = "generate_report_plan"
+    if query_planning == "batched":
+        builder.add_node("plan_section_queries", instrument_node("plan_section_queries", plan_section_queries))
+        builder.add_edge("generate_report_plan", "plan_section_queries")
+        plan_node = "plan_section_queries"
+
+    if scheduling == "eager":
+        builder.add_conditional_edges(plan_node,
+                                      parallelize_all_section_writing,
+                                      ["section_builder_with_web_search", "write_final_sections"])
+        builder.add_edge("section_builder_with_web_search", "compile_final_report")
+    else:
+        builder.add_node("format_completed_sections",
+                         instrument_node("format_completed_sections", format_completed_sections))
+        builder.add_conditional_edges(plan_node,
+                                      parallelize_section_writing,
+                                      ["section_builder_with_web_search"])
+        builder.add_edge("section_builder_with_web_search", "format_completed_sections")
+        builder.add_conditional_edges("format_completed_sections",
+                                      parallelize_final_section_writing,
+                                      ["write_final_sections"])
     builder.add_edge("write_final_sections", "compile_final_report")
     builder.add_edge("compile_final_report", END)
 
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
@@ -6,19 +6,28 @@ from langgraph.constants import Send
 
 from src.models.schemas import SectionState, SectionOutputState
 from src.agents.section_builder import generate_queries, search_web, write_section
+from src.agents.section_digester import digest_section
+from src.utils.metrics import instrument_node
+
+
+def route_section_start(state: SectionState):
+    """Skip query generation for sections whose search queries were planned in advance."""
+    return "search_web" if state.get("search_queries") else "generate_queries"
 
 
 def create_section_workflow():
     """Create the section processing workflow."""
     # Add nodes and edges
     section_builder = StateGraph(SectionState, output=SectionOutputState)
-    section_builder.add_node("generate_queries", generate_queries)
-    section_builder.add_node("search_web", search_web)
-    section_builder.add_node("write_section", write_section)
+    section_builder.add_node("generate_queries", instrument_node("generate_queries", generate_queries))
+    section_builder.add_node("search_web", instrument_node("search_web", search_web))
+    section_builder.add_node("write_section", instrument_node("write_section", write_section))
+    section_builder.add_node("digest_section", instrument_node("digest_section", digest_section))
 
-    section_builder.add_edge(START, "generate_queries")
+    section_builder.add_conditional_edges(START, route_section_start, ["generate_queries", "search_web"])
     section_builder.add_edge("generate_queries", "search_web")
     section_builder.add_edge("search_web", "write_section")
-    section_builder.add_edge("write_section", END)
+    section_builder.add_edge("write_section", "digest_section")
+    section_builder.add_edge("digest_section", END)
     
     return section_builder.compile()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Durable checkpoints: graph state holding the report schemas survives a round trip through the
+SQLite checkpointer that resumed runs read from.
+"""
+import asyncio
+import logging
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_checkpoint_round_trips_report_schemas(tmp_path, monkeypatch, caplog):
+    """Section and SearchQuery values come back as themselves, without unregistered-type warnings."""
+    from langgraph.checkpoint.base import empty_checkpoint
+    from src.agents import runner
+    from src.models.schemas import SearchQuery, Section
+
+    monkeypatch.setattr(runner, "CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite"))
+    values = {
+        "sections": [Section(name="Training", description="Volume and intensity", research=True, content="")],
+        "section_queries": {"Training": [SearchQuery(search_query="hypertrophy training volume")]},
+    }
+
+    async def round_trip():
+        config = {"configurable": {"thread_id": "test", "checkpoint_ns": ""}}
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = values
+        async with runner.open_checkpointer("test") as checkpointer:
+            await checkpointer.aput(config, checkpoint, {}, {})
+        async with runner.open_checkpointer("test") as checkpointer:
+            return (await checkpointer.aget_tuple(config)).checkpoint["channel_values"]
+
+    with caplog.at_level(logging.WARNING):
+        restored = asyncio.run(round_trip())
+    assert restored == values
+    assert isinstance(restored["sections"][0], Section)
+    assert isinstance(restored["section_queries"]["Training"][0], SearchQuery)
+    assert "unregistered type" not in caplog.text
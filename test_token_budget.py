@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Token budget and incremental regeneration: content written under a budget is not reused by a later
+unbudgeted regeneration. Runs the workflow against the stand-ins of benchmarks/fakes.py.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+
+
+# Cache settings of the run, with the module holding each cache and its lazily created instance
+CACHES = {
+    "SEARCH_CACHE_PATH": ("src.utils.search", "search_cache"),
+    "PASSAGE_INDEX_PATH": ("src.utils.search", "passage_index"),
+    "LLM_CACHE_PATH": ("src.utils.llm", "llm_cache"),
+    "SECTION_DIGEST_CACHE_PATH": ("src.agents.section_digester", "digest_cache"),
+    "CHECKPOINT_PATH": ("src.agents.runner", None),
+}
+
+
+@pytest.fixture
+def isolated_run(tmp_path, monkeypatch):
+    """Keep the run's caches under tmp_path and restore the clients install_fakes replaces."""
+    import importlib
+
+    for setting, (module_name, instance) in CACHES.items():
+        path = str(tmp_path / "cache" / (setting.lower() + ".sqlite"))
+        monkeypatch.setenv(setting, path)
+        # The settings are read when the modules are imported, which earlier tests may have done
+        module = importlib.import_module(module_name)
+        monkeypatch.setattr(module, setting, path)
+        if instance is not None:
+            monkeypatch.setattr(module, instance, None)
+
+    from src.utils import llm as llm_utils
+    from src.utils import search
+    monkeypatch.setattr(llm_utils, "chat_models", {})
+    monkeypatch.setattr(llm_utils, "LLM_CACHE_MODE", llm_utils.LLM_CACHE_MODE)
+    monkeypatch.setattr(search, "tavily_search", None)
+    return tmp_path
+
+
+def test_refused_section_changes_fingerprint():
+    """A section refused for lack of output tokens is marked in its fingerprint part."""
+    from src.utils.token_budget import TokenBudget
+
+    budget = TokenBudget(max_output_tokens=1000)
+    budget.plan({"Intro": 4000})
+    budget.charge(0, 900)
+    allocation = budget.allocate("Intro", 2000)
+    assert allocation.refused == "output token budget spent"
+    assert allocation.fingerprint_part() is not None
+    assert TokenBudget().allocate("Intro", 2000).fingerprint_part() is None
+
+
+def test_unbudgeted_regeneration_rewrites_budgeted_sections(isolated_run):
+    """Sections capped by an output budget are written again by an unbudgeted regeneration."""
+    from benchmarks.fakes import FakeChatModel, FakeTavily, install_fakes
+    from src.agents.runner import _run
+    from src.utils.manifest import Regeneration, RunManifest, manifest_path
+    from src.utils.token_budget import TokenBudget
+    from src.workflows.main_workflow import create_main_workflow
+
+    install_fakes(
+        FakeChatModel(latency=0, output_tokens=100, sections=3, queries_per_section=2),
+        FakeTavily(latency=0, page_kb=2)
+    )
+    agent = create_main_workflow()
+    output_path = str(isolated_run / "report.md")
+
+    async def run_twice():
+        budgeted = await _run(
+            "Test topic", verbose=False, thread_id=None, agent=agent, output_path=output_path, show_report=False,
+            budget=TokenBudget(max_output_tokens=1500)
+        )
+        regenerated = await _run(
+            "Test topic", verbose=False, thread_id=None, agent=agent, output_path=output_path, show_report=False,
+            regeneration=Regeneration(RunManifest.load(manifest_path(output_path))), budget=TokenBudget()
+        )
+        return budgeted, regenerated
+
+    budgeted, regenerated = asyncio.run(run_twice())
+    assert budgeted["stats"]["budget"]["refused"] == []
+    assert regenerated["stats"]["regeneration"]["reused"] == []
+    assert len(regenerated["stats"]["regeneration"]["rerun"]) == 5